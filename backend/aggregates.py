@@ -0,0 +1,86 @@
+# aggregates.py
+from typing import Any, Dict, List
+
+STATUSES = ("Correct", "Wrong", "Unattempted")
+
+def local_question_status(question: Dict[str, Any]) -> str:
+    """
+    Status from the answer key alone, used when the evaluation LLM call cannot be afforded or fails.
+    """
+    chosen_option = question.get("chosen_option")
+    if not chosen_option:
+        return "Unattempted"
+    return "Correct" if chosen_option == question.get("correct_option") else "Wrong"
+
+def compute_score_summary(evaluation_results: List[Dict[str, Any]], total_questions: int) -> Dict[str, int]:
+    """
+    Counts the evaluation statuses once so that the summary prompt and the report renderer share them.
+    """
+    counts = {status: 0 for status in STATUSES}
+    for r in evaluation_results:
+        status = r.get("status")
+        if status in counts:
+            counts[status] += 1
+    return {
+        "total_questions": total_questions,
+        "attempted": counts["Correct"] + counts["Wrong"],
+        "correct": counts["Correct"],
+        "wrong": counts["Wrong"],
+        "unattempted": counts["Unattempted"],
+    }
+
+def compute_subject_counts(evaluation_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Per-subject totals and accuracy (correct / attempted * 100) from the evaluation results.
+    """
+    subject_raw_data = {}
+    for eval_item in evaluation_results:
+        subject = eval_item.get("subject", "General")
+        status = eval_item["status"]
+        if subject not in subject_raw_data:
+            subject_raw_data[subject] = {"total": 0, "Correct": 0, "Wrong": 0, "Unattempted": 0}
+        subject_raw_data[subject]["total"] += 1
+        if status in subject_raw_data[subject]:
+            subject_raw_data[subject][status] += 1
+
+    formatted_evaluation_data = []
+    for subject, counts in subject_raw_data.items():
+        attempted = counts["Correct"] + counts["Wrong"]
+        accuracy = (counts["Correct"] / attempted * 100) if attempted > 0 else 0
+        formatted_evaluation_data.append({
+            "subject": subject, "total_questions": counts["total"], "correct": counts["Correct"],
+            "wrong": counts["Wrong"], "unattempted": counts["Unattempted"], "accuracy": round(accuracy, 2)
+        })
+    return formatted_evaluation_data
+
+def subject_status(accuracy: float, attempted: int) -> str:
+    if attempted == 0:
+        return "Not Attempted"
+    if accuracy >= 70:
+        return "Strong"
+    if accuracy >= 40:
+        return "Average"
+    return "Weak"
+
+def local_subject_performance(evaluation_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    The subject_performance structure built without the LLM, used when the deadline leaves no time for subject analysis.
+    """
+    subject_breakdown = {}
+    for counts in compute_subject_counts(evaluation_results):
+        attempted = counts["correct"] + counts["wrong"]
+        subject_breakdown[counts["subject"]] = {
+            "total_questions": counts["total_questions"],
+            "correct": counts["correct"],
+            "wrong": counts["wrong"],
+            "unattempted": counts["unattempted"],
+            "accuracy": counts["accuracy"],
+            "status": subject_status(counts["accuracy"], attempted),
+        }
+    strong = [s for s, d in subject_breakdown.items() if d["status"] == "Strong"]
+    weak = [s for s, d in subject_breakdown.items() if d["status"] in ("Weak", "Not Attempted")]
+    return {
+        "overall_insights": f"Strong subjects: {', '.join(strong) or 'None'}. Weak subjects: {', '.join(weak) or 'None'}.",
+        "subject_breakdown": subject_breakdown,
+        "behavioral_patterns": "Not analysed (computed locally from counts).",
+    }
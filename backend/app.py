@@ -1,17 +1,28 @@
 # app.py
 import json
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from typing import Dict, Any, List
 
-from graph import langgraph_app
-from node import serialize_state # Assuming serialize_state is a helper for the graph
-from report_formatter import format_final_state_for_display # Assuming this is an existing file
+from graph import DEFAULT_PROFILE, GRAPHS, PROFILES, profile_llm_calls
+from serializer import project_state, dumps, compress_payload
+from report_formatter import DISPLAY_SECTIONS, MIMETYPES, render_report, render_report_data, validate_report_options
 from models import AgentState # Import AgentState from models.py
+from performance_store import performance_store
+from deadline import DEFAULT_DEADLINE_SECONDS, deadline_config
+from question_index import question_index
 
 app = Flask(__name__)
 CORS(app) # Enable CORS for frontend communication
 
+def json_response(payload: Dict[str, Any]) -> Response:
+    body, content_encoding = compress_payload(dumps(payload), request.headers.get("Accept-Encoding", ""))
+    response = Response(body, mimetype="application/json")
+    if content_encoding:
+        response.headers["Content-Encoding"] = content_encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
 @app.route('/api/analyze_exam', methods=['POST'])
 def analyze_exam():
     data = request.get_json()
@@ -20,10 +31,43 @@ def analyze_exam():
 
     task = data.get("task", "Analyze UPSC Prelims performance.")
     all_questions = data.get("all_questions", [])
+    # Compact mode returns question ids instead of echoing all_questions and skips the markdown rendering
+    compact = bool(data.get("compact", False))
     print("\n--- Received Exam Data for Analysis ---")
     if not all_questions:
         return jsonify({"error": "No exam questions provided for analysis."}), 400
 
+    # Optional: when given, results are recorded and previous mock tests feed into the summary
+    student_id = data.get("student_id")
+
+    # Pipeline profile (fast/standard/deep): which stages, and so which LLM calls, run
+    profile = data.get("profile", DEFAULT_PROFILE)
+    if profile not in GRAPHS:
+        return jsonify({"error": f"Unknown pipeline profile '{profile}'. Expected one of: {', '.join(GRAPHS)}"}), 400
+
+    # Optional latency budget: optional stages are degraded to finish within it
+    deadline_seconds = data.get("deadline_seconds", DEFAULT_DEADLINE_SECONDS)
+    try:
+        deadline_seconds = float(deadline_seconds) if deadline_seconds is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "deadline_seconds must be a number."}), 400
+
+    # Report rendering options: format (markdown/html/json), selected sections, and streaming
+    report_format = data.get("format", "markdown")
+    stream = bool(data.get("stream", False))
+    try:
+        # When not streaming the LLM report is returned separately, so it is left out of the rendering
+        sections = validate_report_options(report_format, data.get("sections", None if stream else DISPLAY_SECTIONS))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    student_history = {}
+    if student_id:
+        try:
+            student_history = performance_store.get_trends(student_id)
+        except Exception as e:
+            print(f"⚠️ Could not load performance history for student {student_id}: {e}")
+
     initial_state: AgentState = {
         "task": task,
         "all_questions": all_questions,
@@ -32,32 +76,80 @@ def analyze_exam():
         "mindset_insights": [],
         "subject_performance": {},
         "unattempted_reasons": {},
-        "references": [],
         "current_question_index": 0,
-        "plan": "",
+        "score_summary": {},
+        "degraded_stages": [],
+        "student_history": student_history,
         "final_summary_report": ""
     }
 
     try:
         # LangGraph invocation
-        final_state = langgraph_app.invoke(initial_state, {"configurable": {"thread_id": "1"}})
+        final_state = GRAPHS[profile].invoke(initial_state, deadline_config("1", deadline_seconds, PROFILES[profile]))
         print("\n--- LangGraph Analysis Completed ---")
 
+        if student_id:
+            try:
+                performance_store.record_submission(student_id, final_state.get("evaluation_results", []), len(all_questions))
+            except Exception as e:
+                print(f"⚠️ Could not record performance for student {student_id}: {e}")
+
         report_content = final_state.get("final_summary_report", "Analysis report could not be generated.")
+        degraded_stages = final_state.get("degraded_stages", [])
+
+        if compact:
+            return json_response({
+                "report": report_content,
+                "final_state": project_state(final_state, compact=True),
+                "profile": profile,
+                "degraded_stages": degraded_stages
+            })
+
+        if stream:
+            # Sections are sent as soon as they are rendered
+            return Response(
+                stream_with_context(render_report(final_state, report_format, sections)),
+                mimetype=MIMETYPES[report_format],
+                headers={"X-Pipeline-Profile": profile, "X-Degraded-Stages": ",".join(d["stage"] for d in degraded_stages)}
+            )
 
-        # Serialize the final state for display, if necessary
-        serializable_final_state = serialize_state(final_state)
-        final_content = format_final_state_for_display(serializable_final_state)
+        if report_format == "json":
+            final_content = render_report_data(final_state, sections)
+        else:
+            final_content = "".join(render_report(final_state, report_format, sections))
 
         print("\n--- Final Report Content Generated ---")
         print(final_content)
-        return jsonify({
+        return json_response({
             "report": report_content,
-            "final_state": final_content
+            "final_state": final_content,
+            "profile": profile,
+            "degraded_stages": degraded_stages
         })
     except Exception as e:
         print(f"Error during LangGraph invocation: {e}")
         return jsonify({"error": f"An error occurred during analysis: {str(e)}"}), 500
 
+@app.route('/api/students/<student_id>/trends', methods=['GET'])
+def student_trends(student_id: str):
+    include_history = request.args.get("history", "").lower() in ("1", "true", "yes")
+    trends = performance_store.get_trends(student_id, include_history=include_history)
+    if not trends["submissions"]:
+        return jsonify({"error": f"No mock tests recorded for student '{student_id}'."}), 404
+    return json_response(trends)
+
+@app.route('/api/profiles', methods=['GET'])
+def pipeline_profiles():
+    # The stages each profile runs and the LLM calls they make
+    return jsonify({
+        "default": DEFAULT_PROFILE,
+        "profiles": {profile: {"llm_calls": profile_llm_calls(profile)} for profile in PROFILES}
+    })
+
+@app.route('/api/question_index/stats', methods=['GET'])
+def question_index_stats():
+    # Per-worker counters since startup
+    return jsonify(question_index.stats())
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,89 @@
+# bench_serialization.py
+# Measures final-state serialization time and response payload size.
+# Usage: python bench_serialization.py
+import gzip
+import json
+import time
+from typing import Any, Dict, List
+
+from models import AgentState, MindsetInsightDetail
+from serializer import brotli, dumps, project_state, state_to_dict
+
+SIZES = [100, 1000]
+REPEATS = 20
+
+def legacy_serialize_state(obj):
+    # The previous recursive serializer, kept here as the baseline
+    if hasattr(obj, 'dict'):
+        return obj.dict()
+    elif hasattr(obj, 'to_dict'):
+        return obj.to_dict()
+    elif isinstance(obj, list):
+        return [legacy_serialize_state(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {key: legacy_serialize_state(value) for key, value in obj.items()}
+    elif hasattr(obj, '__dict__') and not isinstance(obj, (str, int, float, bool, type(None))):
+        return {key: legacy_serialize_state(value) for key, value in obj.__dict__.items()}
+    return obj
+
+def build_state(n: int) -> AgentState:
+    statuses = ["Correct", "Wrong", "Unattempted"]
+    subjects = ["History", "Polity", "Geography", "Economy", "Environment"]
+    questions: List[Dict[str, Any]] = []
+    evaluations: List[Dict[str, Any]] = []
+    insights: List[MindsetInsightDetail] = []
+    for i in range(n):
+        qid = f"Q{i:04d}"
+        status = statuses[i % 3]
+        subject = subjects[i % len(subjects)]
+        questions.append({
+            "id": qid,
+            "text": f"Which of the following statements about topic {i} is correct? " * 2,
+            "options": {opt: f"Option {opt} for question {i}" for opt in "ABCD"},
+            "correct_option": "A",
+            "chosen_option": "B" if status == "Wrong" else ("A" if status == "Correct" else ""),
+            "subject": subject,
+        })
+        evaluations.append({"qid": qid, "status": status, "subject": subject})
+        if status == "Wrong":
+            insights.append(MindsetInsightDetail(
+                question_id=qid,
+                chosen_option_analysis="The student likely confused two related concepts. " * 3,
+                depth_of_knowledge_assessment="Superficial understanding of the topic. " * 3,
+                distractor_analysis={opt: f"Analysis of option {opt}. " * 3 for opt in "ABCD"},
+                improvement_suggestion="Revise the topic from standard sources. " * 2,
+            ))
+    return {
+        "task": "Analyze UPSC Prelims performance.",
+        "all_questions": questions,
+        "current_question": questions[-1],
+        "evaluation_results": evaluations,
+        "mindset_insights": insights,
+        "subject_performance": {"overall_insights": "N/A", "subject_breakdown": {}, "behavioral_patterns": "N/A"},
+        "unattempted_reasons": {"individual_reasons": [], "overall_summary": "N/A"},
+        "current_question_index": n,
+        "final_summary_report": "Report. " * 500,
+    }
+
+def time_ms(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        fn()
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+def sizes(body: bytes) -> str:
+    parts = [f"raw={len(body):>9,}", f"gzip={len(gzip.compress(body, compresslevel=6)):>8,}"]
+    if brotli is not None:
+        parts.append(f"br={len(brotli.compress(body, quality=5)):>8,}")
+    return "  ".join(parts)
+
+if __name__ == "__main__":
+    for n in SIZES:
+        state = build_state(n)
+        print(f"\n--- {n} questions ---")
+        print(f"legacy serialize_state + json.dumps : {time_ms(lambda: json.dumps(legacy_serialize_state(state))):8.2f} ms")
+        print(f"state_to_dict (orjson)              : {time_ms(lambda: state_to_dict(state)):8.2f} ms")
+        print(f"dumps full state                    : {time_ms(lambda: dumps(project_state(state))):8.2f} ms")
+        print(f"dumps compact state                 : {time_ms(lambda: dumps(project_state(state, compact=True))):8.2f} ms")
+        print(f"payload full    : {sizes(dumps(project_state(state)))}")
+        print(f"payload compact : {sizes(dumps(project_state(state, compact=True)))}")
@@ -0,0 +1,68 @@
+# deadline.py
+# Request-level latency budget carried in the graph config ("configurable" -> "deadline").
+# Each node reserves the expected cost of the stages the active profile runs after it ("configurable" ->
+# "stages"). When a node cannot afford its LLM call it falls back locally: tagging uses the local classifier,
+# evaluation uses the answer key, mindset analysis shrinks, subject stats are computed locally, unattempted
+# analysis is skipped and the summary is templated.
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+# Expected seconds per LLM call of each graph node on a slow provider day
+STAGE_COSTS = {
+    "llm_subject_tagging": 2.0, # Per question sent to the LLM
+    "evaluate_question": 3.0, # Per question
+    "mindset_inference": 8.0, # Per wrong question
+    "subject_analysis": 8.0,
+    "local_subject_analysis": 0.0,
+    "unattempted_analysis": 8.0,
+    "summary_report": 25.0,
+}
+# Default budget for /api/analyze_exam when the request does not set one (unset = no deadline)
+DEFAULT_DEADLINE_SECONDS = os.getenv("ANALYZE_DEADLINE_SECONDS")
+
+def deadline_config(thread_id: str, deadline_seconds: Optional[float], stages: Optional[List[str]] = None) -> RunnableConfig:
+    configurable: Dict[str, Any] = {"thread_id": thread_id}
+    if deadline_seconds is not None:
+        configurable["deadline"] = time.monotonic() + float(deadline_seconds)
+    if stages is not None:
+        configurable["stages"] = list(stages)
+    return {"configurable": configurable}
+
+def remaining_seconds(config: Optional[RunnableConfig]) -> Optional[float]:
+    """
+    Seconds left before the request deadline, or None when the request has no deadline.
+    """
+    deadline = ((config or {}).get("configurable") or {}).get("deadline")
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def can_afford(config: Optional[RunnableConfig], *costs: float) -> bool:
+    remaining = remaining_seconds(config)
+    return remaining is None or remaining >= sum(costs)
+
+def reserved_after(config: Optional[RunnableConfig], stage: str, calls: Optional[Dict[str, int]] = None) -> float:
+    """
+    Expected seconds of the stages the active profile runs after `stage`. `calls` overrides the
+    number of LLM calls a stage makes (default 1, e.g. 0 for unattempted analysis with nothing to analyse).
+    """
+    stages = ((config or {}).get("configurable") or {}).get("stages") or []
+    following = stages[stages.index(stage) + 1:] if stage in stages else []
+    calls = calls or {}
+    return sum(STAGE_COSTS.get(name, 0.0) * calls.get(name, 1) for name in following)
+
+def llm_timeout(config: Optional[RunnableConfig]) -> Dict[str, float]:
+    # Extra kwargs for model.invoke so a single slow call cannot overrun the deadline
+    remaining = remaining_seconds(config)
+    return {} if remaining is None else {"timeout": max(1.0, remaining)}
+
+def mark_degraded(state: Dict[str, Any], stage: str, action: str) -> List[Dict[str, str]]:
+    # One entry per stage; a stage that degrades again (e.g. once per question) updates its entry
+    degraded_stages = [d for d in state.get("degraded_stages") or [] if d["stage"] != stage]
+    degraded_stages.append({"stage": stage, "action": action})
+    state["degraded_stages"] = degraded_stages
+    print(f"⏱️ Deadline: degraded {stage} → {action}")
+    return degraded_stages
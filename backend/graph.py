@@ -4,15 +4,110 @@ import os
 
 from models import AgentState
 from node import (
-    plan_node,
     llm_subject_tagging_node,
     evaluate_node,
     mindset_inference_node,
     subject_analysis_node,
+    local_subject_analysis_node,
     unattempted_analysis_node,
     summary_report_node
 )
 
+# --- Node Catalogue ---
+# State keys each node reads and writes, and the LLM calls it makes.
+NODES = {
+    "llm_subject_tagging": {
+        "fn": llm_subject_tagging_node,
+        "reads": ["all_questions"],
+        "writes": ["all_questions"],
+        "llm_calls": "1 per untagged question not matched by the question index or the local classifier",
+    },
+    "evaluate_question": {
+        "fn": evaluate_node,
+        "reads": ["all_questions", "current_question_index"],
+        "writes": ["evaluation_results", "current_question_index"],
+        "llm_calls": "1 per question",
+    },
+    "mindset_inference": {
+        "fn": mindset_inference_node,
+        "reads": ["evaluation_results", "all_questions", "mindset_insights"],
+        "writes": ["mindset_insights"],
+        "llm_calls": "1 per wrong question not matched by the question index",
+    },
+    "subject_analysis": {
+        "fn": subject_analysis_node,
+        "reads": ["evaluation_results"],
+        "writes": ["subject_performance"],
+        "llm_calls": "1 call",
+    },
+    "local_subject_analysis": {
+        "fn": local_subject_analysis_node,
+        "reads": ["evaluation_results"],
+        "writes": ["subject_performance"],
+        "llm_calls": "none",
+    },
+    "unattempted_analysis": {
+        "fn": unattempted_analysis_node,
+        "reads": ["evaluation_results", "all_questions"],
+        "writes": ["unattempted_reasons"],
+        "llm_calls": "1 call, only if a question was left unattempted",
+    },
+    "summary_report": {
+        "fn": summary_report_node,
+        "reads": ["evaluation_results", "all_questions", "subject_performance", "mindset_insights",
+                  "unattempted_reasons", "student_history"],
+        "writes": ["final_summary_report", "score_summary"],
+        "llm_calls": "1 call",
+    },
+}
+
+# State keys the API response and report renderer read from the final state
+RESPONSE_READS = {
+    "final_summary_report", "score_summary", "subject_performance", "mindset_insights",
+    "unattempted_reasons", "evaluation_results", "all_questions", "degraded_stages",
+}
+# State keys the conditional edges read (the evaluation loop cursor)
+EDGE_READS = {"current_question_index", "all_questions"}
+
+# --- Pipeline Profiles ---
+# Nodes run in the listed order.
+#   fast:     subject tagging, evaluation, local subject stats, summary
+#   standard: fast + mindset analysis of wrong answers + unattempted analysis
+#   deep:     standard with LLM subject analysis (overall insights and behavioural patterns)
+PROFILES = {
+    "fast": ["llm_subject_tagging", "evaluate_question", "local_subject_analysis", "summary_report"],
+    "standard": ["llm_subject_tagging", "evaluate_question", "mindset_inference", "local_subject_analysis",
+                 "unattempted_analysis", "summary_report"],
+    "deep": ["llm_subject_tagging", "evaluate_question", "mindset_inference", "subject_analysis",
+             "unattempted_analysis", "summary_report"],
+}
+DEFAULT_PROFILE = os.getenv("PIPELINE_PROFILE", "deep")
+if DEFAULT_PROFILE not in PROFILES:
+    raise ValueError(f"PIPELINE_PROFILE '{DEFAULT_PROFILE}' is not a pipeline profile. Expected one of: {', '.join(PROFILES)}")
+
+def profile_llm_calls(profile: str) -> dict:
+    """
+    The LLM calls a profile makes, per node.
+    """
+    return {name: NODES[name]["llm_calls"] for name in PROFILES[profile]}
+
+def unread_outputs(profile: str) -> dict:
+    """
+    Outputs of the profile's nodes that no other node in the profile, conditional edge or the response reads.
+    A node reading its own output does not count.
+    """
+    nodes = PROFILES[profile]
+    unread = {}
+    for name in nodes:
+        consumed = RESPONSE_READS | EDGE_READS
+        for other in nodes:
+            if other != name:
+                consumed = consumed.union(NODES[other]["reads"])
+        keys = sorted(set(NODES[name]["writes"]) - consumed)
+        if keys:
+            unread[name] = keys
+    return unread
+
 # --- Conditional Edges ---
 def should_continue_evaluating(state: AgentState) -> str:
     if state["current_question_index"] < len(state["all_questions"]):
@@ -21,40 +116,43 @@ def should_continue_evaluating(state: AgentState) -> str:
         return "evaluation_complete"
 
 # --- Building the LangGraph ---
-workflow = StateGraph(AgentState)
-
-# Add nodes
-workflow.add_node("planner", plan_node)
-workflow.add_node("llm_subject_tagging", llm_subject_tagging_node)
-workflow.add_node("evaluate_question", evaluate_node)
-workflow.add_node("mindset_inference", mindset_inference_node)
-workflow.add_node("subject_analysis", subject_analysis_node)
-workflow.add_node("unattempted_analysis", unattempted_analysis_node)
-workflow.add_node("summary_report", summary_report_node)
-
-# Set entry point
-workflow.set_entry_point("planner")
-
-# Add edges
-workflow.add_edge("planner", "llm_subject_tagging")
-workflow.add_edge("llm_subject_tagging", "evaluate_question")
-
-# Conditional edge for evaluation loop
-workflow.add_conditional_edges(
-    "evaluate_question",
-    should_continue_evaluating,
-    {
-        "continue_evaluation": "evaluate_question",
-        "evaluation_complete": "mindset_inference"
-    }
-)
+def build_graph(profile: str):
+    """
+    Compiles the graph variant for a profile. Raises ValueError if a node's output would go unread.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown pipeline profile '{profile}'. Expected one of: {', '.join(PROFILES)}")
+    unread = unread_outputs(profile)
+    if unread:
+        raise ValueError(f"Profile '{profile}' runs nodes whose outputs are never read: {unread}")
+
+    nodes = PROFILES[profile]
+    workflow = StateGraph(AgentState)
+
+    # Add nodes
+    for name in nodes:
+        workflow.add_node(name, NODES[name]["fn"])
+
+    # Set entry point
+    workflow.set_entry_point(nodes[0])
 
-workflow.add_edge("mindset_inference", "subject_analysis")
-workflow.add_edge("subject_analysis", "unattempted_analysis")
-workflow.add_edge("unattempted_analysis", "summary_report")
-workflow.add_edge("summary_report", END)
+    # Add edges; evaluation loops over the questions before moving on
+    for current, following in zip(nodes, nodes[1:] + [END]):
+        if current == "evaluate_question":
+            workflow.add_conditional_edges(
+                "evaluate_question",
+                should_continue_evaluating,
+                {
+                    "continue_evaluation": "evaluate_question",
+                    "evaluation_complete": following
+                }
+            )
+        else:
+            workflow.add_edge(current, following)
 
-# Compile the graph
-langgraph_app = workflow.compile()
-print("\n--- LangGraph Workflow Compiled Successfully ---")
+    return workflow.compile()
 
+# Compile the graphs
+GRAPHS = {profile: build_graph(profile) for profile in PROFILES}
+langgraph_app = GRAPHS[DEFAULT_PROFILE]
+print("\n--- LangGraph Workflows Compiled Successfully ---")
@@ -27,7 +27,8 @@ class AgentState(TypedDict):
     subject_performance: Dict[str, Any]
     unattempted_reasons: Dict[str, Any]
     all_questions: List[Dict[str, Any]]
-    references: List[str]
     current_question_index: int
-    plan: str
+    student_history: Dict[str, Any] # Precomputed aggregates from previous mock tests (performance_store)
+    degraded_stages: List[Dict[str, str]] # Stages cut short to meet the request deadline (deadline.py)
+    score_summary: Dict[str, int] # Status counts computed once by summary_report_node
     final_summary_report: str # This will hold the LLM's full generated report
\ No newline at end of file
@@ -2,74 +2,112 @@
 import json
 import os # Import os for environment variables
 from dotenv import load_dotenv # Import load_dotenv
-from typing import Any, Dict, List
+from collections import Counter
+from typing import Any, Dict, List, Optional
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
 from pydantic.v1 import BaseModel # Using pydantic.v1
 
 from models import AgentState, QuestionEvaluation, MindsetInsightDetail
+from aggregates import compute_score_summary, compute_subject_counts, local_question_status, local_subject_performance
+from deadline import STAGE_COSTS, can_afford, llm_timeout, mark_degraded, remaining_seconds, reserved_after
+from question_index import question_index
+from subject_classifier import SUBJECT_CLASSIFIER_THRESHOLD, load_classifier, normalize_subject, record_tagged_question
 from prompt import (
-    PLAN_PROMPT,
     EVALUATE_PROMPT,
     MINDSET_PROMPT,
     SUBJECT_ANALYSIS_PROMPT,
     UNATTEMPTED_PROMPT,
     SUMMARY_PROMPT,
-    LLM_SUBJECT_PROMPT
+    LLM_SUBJECT_PROMPT,
+    FALLBACK_SUMMARY_TEMPLATE
 )
 
 # --- Environment Variable Setup ---
 load_dotenv() # Load environment variables from .env file
 model = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.2)
+subject_classifier = load_classifier() # None until a model has been trained
 
 # --- Node Definitions ---
-def plan_node(state: AgentState):
-    print("\n--- Executing Plan Node ---")
-    messages = [
-        SystemMessage(content=PLAN_PROMPT),
-        HumanMessage(content=state['task'])
-    ]
-    response = model.invoke(messages)
-    print("--- Plan Node Completed ---")
-    return {"plan": response.content}
-
-def llm_subject_tagging_node(state: AgentState) -> AgentState:
+def llm_subject_tagging_node(state: AgentState, config: Optional[RunnableConfig] = None) -> AgentState:
     print("\n--- Executing LLM Subject Tagging Node ---")
     updated_questions = []
+    # Time kept for evaluating every question and the stages after it
+    reserved = reserved_after(config, "llm_subject_tagging", {"evaluate_question": len(state["all_questions"])})
+    tagged_locally = 0
     for question in state["all_questions"]:
         # Only tag if subject is missing or empty
         if "subject" not in question or not question["subject"]:
-            prompt = LLM_SUBJECT_PROMPT.format(question_text=question["text"])
-            messages = [
-                SystemMessage(content="You are a UPSC subject classifier. Respond with only the subject name (e.g., History, Geography, Polity, Economics, Environment, Science, Current Affairs, General)."),
-                HumanMessage(content=prompt)
-            ]
-            try:
-                response = model.invoke(messages)
-                subject = response.content.strip()
-                question["subject"] = subject
-                print(f"✅ LLM tagged QID={question['id']} → Subject: {subject}")
-            except Exception as e:
-                print(f"⚠️ LLM failed to classify QID={question['id']}: {e}")
-                question["subject"] = "General" # Fallback to General if LLM fails
+            # Fast paths: reuse the tag of a near-duplicate question, then the local classifier;
+            # only questions neither can handle go to the LLM
+            indexed_subject = question_index.lookup_subject(question)
+            local_subject, confidence = (None, 0.0)
+            if not indexed_subject and subject_classifier:
+                local_subject, confidence = subject_classifier.predict(question["text"])
+            if indexed_subject:
+                question["subject"] = indexed_subject
+                print(f"♻️ Reused subject of a similar question for QID={question['id']} → Subject: {indexed_subject}")
+            elif local_subject and confidence >= SUBJECT_CLASSIFIER_THRESHOLD:
+                question["subject"] = local_subject
+                print(f"⚡ Local classifier tagged QID={question['id']} → Subject: {local_subject} ({confidence:.2f})")
+            elif not can_afford(config, STAGE_COSTS["llm_subject_tagging"], reserved):
+                # Out of time: take the low-confidence local prediction; not recorded as training data
+                question["subject"] = local_subject or "General"
+                tagged_locally += 1
+                mark_degraded(state, "llm_subject_tagging", f"tagged {tagged_locally} question(s) with the local classifier or General")
+            else:
+                prompt = LLM_SUBJECT_PROMPT.format(question_text=question["text"])
+                messages = [
+                    SystemMessage(content="You are a UPSC subject classifier. Respond with only the subject name (e.g., History, Geography, Polity, Economics, Environment, Science, Current Affairs, General)."),
+                    HumanMessage(content=prompt)
+                ]
+                try:
+                    response = model.invoke(messages, **llm_timeout(config))
+                    subject = normalize_subject(response.content)
+                    question["subject"] = subject or "General" # Fallback to General on an empty reply
+                    print(f"✅ LLM tagged QID={question['id']} → Subject: {question['subject']}")
+                    if subject:
+                        _record_subject_tag(question, "llm")
+                except Exception as e:
+                    print(f"⚠️ LLM failed to classify QID={question['id']}: {e}")
+                    question["subject"] = "General" # Fallback to General if LLM fails
+        else:
+            _record_subject_tag(question, "provided")
         updated_questions.append(question) # Add question (tagged or original) to the new list
     state["all_questions"] = updated_questions # Update the state with potentially tagged questions
     print("--- LLM Subject Tagging Node Completed ---")
     return state
 
-def evaluate_node(state: AgentState) -> AgentState:
+def _record_subject_tag(question: Dict[str, Any], source: str) -> None:
+    # Tagged questions are indexed for reuse across paraphrased questions and become training
+    # data for `python subject_classifier.py train`; questions already indexed with the same
+    # subject are not appended to the dataset again
+    try:
+        if question_index.add_subject(question, question["subject"]):
+            record_tagged_question(question.get("text", ""), question["subject"], source)
+    except Exception as e:
+        print(f"⚠️ Could not record subject tag for QID={question.get('id')}: {e}")
+
+def evaluate_node(state: AgentState, config: Optional[RunnableConfig] = None) -> AgentState:
     print("\n--- Executing Evaluation Node ---")
     if state["current_question_index"] >= len(state["all_questions"]):
         print("--- Evaluation Node: All questions processed ---")
         return state
 
     current_q_data = state["all_questions"][state["current_question_index"]]
-    state["current_question"] = current_q_data
 
     # Ensure subject is available for the current question
     # It should have been tagged by llm_subject_tagging_node already
     subject_for_eval = current_q_data.get("subject", "General")
 
+    # Keep time for this question and the stages after evaluation; otherwise decide from the answer key
+    if not can_afford(config, STAGE_COSTS["evaluate_question"], reserved_after(config, "evaluate_question")):
+        _evaluate_locally(state, current_q_data, subject_for_eval)
+        state["current_question_index"] += 1
+        print(f"--- Evaluation Node Processed QID={current_q_data['id']} (answer key) ---")
+        return state
+
     structured_llm_evaluator = model.with_structured_output(QuestionEvaluation, method="function_calling")
 
     prompt_text = EVALUATE_PROMPT.format(
@@ -85,7 +123,7 @@ def evaluate_node(state: AgentState) -> AgentState:
     )
 
     try:
-        evaluation_result_obj = structured_llm_evaluator.invoke([HumanMessage(content=prompt_text)])
+        evaluation_result_obj = structured_llm_evaluator.invoke([HumanMessage(content=prompt_text)], **llm_timeout(config))
         evaluation_result_dict = evaluation_result_obj.dict()
 
         # Ensure 'subject' field from LLM is consistent, or use the one from question data
@@ -99,20 +137,23 @@ def evaluate_node(state: AgentState) -> AgentState:
     except Exception as e:
         print(f"❌ Error during evaluation_node for QID={current_q_data['id']}: {e}")
         print(f"Prompt used:\n{prompt_text}")
-        # Fallback for evaluation result if LLM fails, use the pre-tagged subject
-        state["evaluation_results"].append({
-            "qid": current_q_data["id"],
-            "status": "Unknown",
-            "subject": subject_for_eval,
-            "error": str(e)
-        })
+        # Fallback for evaluation result if LLM fails: decide from the answer key, use the pre-tagged subject
+        _evaluate_locally(state, current_q_data, subject_for_eval, error=str(e))
 
     state["current_question_index"] += 1
     print(f"--- Evaluation Node Processed QID={current_q_data['id']} ---")
     return state
 
+def _evaluate_locally(state: AgentState, question: Dict[str, Any], subject: str, error: Optional[str] = None) -> None:
+    result = {"qid": question["id"], "status": local_question_status(question), "subject": subject, "evaluated_locally": True}
+    if error:
+        result["error"] = error
+    state.setdefault("evaluation_results", []).append(result)
+    evaluated_locally = sum(1 for r in state["evaluation_results"] if r.get("evaluated_locally"))
+    mark_degraded(state, "evaluate_question", f"decided {evaluated_locally} question(s) from the answer key")
+
 
-def mindset_inference_node(state: AgentState) -> AgentState:
+def mindset_inference_node(state: AgentState, config: Optional[RunnableConfig] = None) -> AgentState:
     print("\n--- Executing mindset_inference_node ---")
 
     current_mindset_qids = {insight.question_id for insight in state.get("mindset_insights", [])}
@@ -132,8 +173,27 @@ def mindset_inference_node(state: AgentState) -> AgentState:
 
     structured_llm_mindset = model.with_structured_output(MindsetInsightDetail, method="function_calling")
 
-    for q_data in wrong_questions_for_mindset:
+    if remaining_seconds(config) is not None:
+        # Under a deadline, analyse the wrong answers from the subjects with the most mistakes first
+        wrong_by_subject = Counter(q.get("subject", "General") for q in wrong_questions_for_mindset)
+        wrong_questions_for_mindset.sort(key=lambda q: -wrong_by_subject[q.get("subject", "General")])
+    # Time kept for the stages this profile runs after mindset analysis
+    any_unattempted = any(q_eval["status"] == "Unattempted" for q_eval in state.get("evaluation_results", []))
+    reserved = reserved_after(config, "mindset_inference", {"unattempted_analysis": int(any_unattempted)})
+
+    for position, q_data in enumerate(wrong_questions_for_mindset):
         try:
+            # Paraphrases with the same correct and chosen options reuse the stored analysis
+            reused_insight = question_index.lookup_insight(q_data)
+            if reused_insight:
+                state["mindset_insights"].append(MindsetInsightDetail(**reused_insight))
+                print(f"♻️ Reused mindset insight of a similar question for QID={q_data['id']}")
+                continue
+
+            if not can_afford(config, STAGE_COSTS["mindset_inference"], reserved):
+                mark_degraded(state, "mindset_inference", f"analysed top {position} of {len(wrong_questions_for_mindset)} wrong questions")
+                break
+
             subject = next(
                 (q_eval["subject"] for q_eval in state["evaluation_results"] if q_eval["qid"] == q_data["id"]),
                 "Unknown"
@@ -156,10 +216,15 @@ def mindset_inference_node(state: AgentState) -> AgentState:
                 HumanMessage(content=prompt_text)
             ]
 
-            mindset_insight_obj = structured_llm_mindset.invoke(messages)
+            mindset_insight_obj = structured_llm_mindset.invoke(messages, **llm_timeout(config))
             state["mindset_insights"].append(mindset_insight_obj)
             print(f"✅ Generated mindset insight for QID={q_data['id']}")
 
+            try:
+                question_index.add_insight(q_data, mindset_insight_obj.dict())
+            except Exception as e:
+                print(f"⚠️ Could not index mindset insight for QID={q_data['id']}: {e}")
+
         except Exception as e:
             print(f"❌ Error generating mindset insight for QID={q_data['id']}: {e}")
             continue
@@ -167,7 +232,7 @@ def mindset_inference_node(state: AgentState) -> AgentState:
     print("--- Mindset Inference Node Completed ---")
     return state
 
-def subject_analysis_node(state: AgentState) -> AgentState:
+def subject_analysis_node(state: AgentState, config: Optional[RunnableConfig] = None) -> AgentState:
     print("\n--- Executing Subject Analysis Node ---")
     evaluated_data = state.get("evaluation_results", [])
     if not evaluated_data:
@@ -175,27 +240,25 @@ def subject_analysis_node(state: AgentState) -> AgentState:
         print("--- Subject Analysis Node Completed: No data ---")
         return state
 
-    subject_raw_data = {}
-    for eval_item in evaluated_data:
-        subject = eval_item.get("subject", "General")
-        status = eval_item["status"]
-        if subject not in subject_raw_data:
-            subject_raw_data[subject] = {"total": 0, "Correct": 0, "Wrong": 0, "Unattempted": 0}
-        subject_raw_data[subject]["total"] += 1
-        subject_raw_data[subject][status] += 1
-
-    formatted_evaluation_data = []
-    for subject, counts in subject_raw_data.items():
-        attempted = counts["Correct"] + counts["Wrong"]
-        accuracy = (counts["Correct"] / attempted * 100) if attempted > 0 else 0
-        formatted_evaluation_data.append({
-            "subject": subject, "total_questions": counts["total"], "correct": counts["Correct"],
-            "wrong": counts["Wrong"], "unattempted": counts["Unattempted"], "accuracy": round(accuracy, 2)
-        })
+    any_unattempted = any(q_eval["status"] == "Unattempted" for q_eval in evaluated_data)
+    if not can_afford(config, STAGE_COSTS["subject_analysis"],
+                      reserved_after(config, "subject_analysis", {"unattempted_analysis": int(any_unattempted)})):
+        state["subject_performance"] = local_subject_performance(evaluated_data)
+        mark_degraded(state, "subject_analysis", "used local subject stats")
+        print("--- Subject Analysis Node Completed: Local stats ---")
+        return state
+
+    formatted_evaluation_data = compute_subject_counts(evaluated_data)
 
     prompt_text = SUBJECT_ANALYSIS_PROMPT.format(evaluation_data_json=json.dumps(formatted_evaluation_data, indent=2))
     messages = [SystemMessage(content="You are a subject-level performance analyst. Your response MUST be a JSON object as specified in the prompt."), HumanMessage(content=prompt_text)]
-    response = model.invoke(messages)
+    try:
+        response = model.invoke(messages, **llm_timeout(config))
+    except Exception as e:
+        print(f"Error invoking LLM for subject analysis: {e}")
+        state["subject_performance"] = local_subject_performance(evaluated_data)
+        mark_degraded(state, "subject_analysis", "used local subject stats (LLM call failed or timed out)")
+        return state
 
     try:
         subject_analysis_result = json.loads(response.content)
@@ -206,7 +269,17 @@ def subject_analysis_node(state: AgentState) -> AgentState:
     print("--- Subject Analysis Node Completed ---")
     return state
 
-def unattempted_analysis_node(state: AgentState) -> AgentState:
+def local_subject_analysis_node(state: AgentState) -> AgentState:
+    print("\n--- Executing Local Subject Analysis Node ---")
+    evaluated_data = state.get("evaluation_results", [])
+    if not evaluated_data:
+        state["subject_performance"] = {"error": "No evaluation data available."}
+    else:
+        state["subject_performance"] = local_subject_performance(evaluated_data)
+    print("--- Local Subject Analysis Node Completed ---")
+    return state
+
+def unattempted_analysis_node(state: AgentState, config: Optional[RunnableConfig] = None) -> AgentState:
     print("\n--- Executing unattempted_analysis_node ---")
     unattempted_questions_eval = [
         q_eval for q_eval in state.get("evaluation_results", [])
@@ -233,6 +306,16 @@ def unattempted_analysis_node(state: AgentState) -> AgentState:
         print("--- Unattempted Analysis Node Completed: No unattempted questions ---")
         return state
 
+    # Keep time for the summary
+    if not can_afford(config, STAGE_COSTS["unattempted_analysis"], reserved_after(config, "unattempted_analysis")):
+        state["unattempted_reasons"] = {
+            "individual_reasons": [],
+            "overall_summary": f"{len(unattempted_data_for_llm)} question(s) were left unattempted; reasons were not analysed within the time limit."
+        }
+        mark_degraded(state, "unattempted_analysis", "skipped reasons analysis")
+        print("--- Unattempted Analysis Node Completed: Skipped ---")
+        return state
+
     prompt_text = UNATTEMPTED_PROMPT.format(
         unattempted_questions_json=json.dumps(unattempted_data_for_llm, indent=2)
     )
@@ -241,7 +324,16 @@ def unattempted_analysis_node(state: AgentState) -> AgentState:
         SystemMessage(content="You are an analyst. Your response MUST be a JSON object as specified in the prompt, with 'individual_reasons' (array of objects) and 'overall_summary' (string)."),
         HumanMessage(content=prompt_text)
     ]
-    response = model.invoke(messages)
+    try:
+        response = model.invoke(messages, **llm_timeout(config))
+    except Exception as e:
+        print(f"Error invoking LLM for unattempted analysis: {e}")
+        state["unattempted_reasons"] = {
+            "individual_reasons": [],
+            "overall_summary": f"{len(unattempted_data_for_llm)} question(s) were left unattempted; reasons could not be analysed."
+        }
+        mark_degraded(state, "unattempted_analysis", "skipped reasons analysis (LLM call failed or timed out)")
+        return state
 
     try:
         unattempted_analysis_result = json.loads(response.content)
@@ -259,41 +351,50 @@ def unattempted_analysis_node(state: AgentState) -> AgentState:
     return state
 
 
-def summary_report_node(state: AgentState) -> AgentState:
+def summary_report_node(state: AgentState, config: Optional[RunnableConfig] = None) -> AgentState:
     """
     Generates a comprehensive summary report by leveraging an LLM with all gathered analysis data.
     """
     print("\n--- Executing summary_report_node ---")
 
-    total_questions = len(state.get("all_questions", []))
-    evaluated_results = state.get("evaluation_results", [])
-    correct = sum(1 for r in evaluated_results if r["status"] == "Correct")
-    wrong = sum(1 for r in evaluated_results if r["status"] == "Wrong")
-    unattempted = sum(1 for r in evaluated_results if r["status"] == "Unattempted")
-    attempted = correct + wrong
+    score_summary = compute_score_summary(state.get("evaluation_results", []), len(state.get("all_questions", [])))
+    state["score_summary"] = score_summary
+
+    if not can_afford(config, STAGE_COSTS["summary_report"], reserved_after(config, "summary_report")):
+        state["final_summary_report"] = templated_summary(state, "the analysis deadline was reached")
+        mark_degraded(state, "summary_report", "used templated summary")
+        print("--- Summary Report Node Completed: Templated ---")
+        return state
 
     subject_performance_data = state.get("subject_performance", {})
     mindset_insights_list = state.get("mindset_insights", [])
     unattempted_reasons_data = state.get("unattempted_reasons", {})
-    references_list = state.get("references", [])
 
     serializable_mindset_insights = [insight.dict() if isinstance(insight, BaseModel) else insight for insight in mindset_insights_list]
 
     subject_performance_str = json.dumps(subject_performance_data, indent=2)
     mindset_insights_str = json.dumps(serializable_mindset_insights, indent=2)
     unattempted_reasons_str = json.dumps(unattempted_reasons_data, indent=2)
-    references_str = json.dumps(references_list, indent=2)
+    student_history = state.get("student_history") or {}
+    if student_history.get("submissions"):
+        student_history_str = json.dumps({
+            "previous_mock_tests": student_history["submissions"],
+            "overall": student_history["overall"],
+            "subjects": student_history["subjects"]
+        }, indent=2)
+    else:
+        student_history_str = "No previous mock tests recorded."
 
     prompt_text = SUMMARY_PROMPT.format(
-        total_questions=total_questions,
-        attempted=attempted,
-        correct=correct,
-        wrong=wrong,
-        unattempted=unattempted,
+        total_questions=score_summary["total_questions"],
+        attempted=score_summary["attempted"],
+        correct=score_summary["correct"],
+        wrong=score_summary["wrong"],
+        unattempted=score_summary["unattempted"],
         subject_performance=subject_performance_str,
         mindset_insights=mindset_insights_str,
         unattempted_reasons=unattempted_reasons_str,
-        references=references_str
+        student_history=student_history_str
     )
 
     messages = [
@@ -302,26 +403,43 @@ def summary_report_node(state: AgentState) -> AgentState:
     ]
 
     try:
-        response = model.invoke(messages)
+        response = model.invoke(messages, **llm_timeout(config))
         llm_generated_content = response.content
     except Exception as e:
         print(f"Error invoking LLM for summary report: {e}")
-        llm_generated_content = "Error generating summary report from LLM."
+        llm_generated_content = templated_summary(state, "the detailed report could not be generated")
+        mark_degraded(state, "summary_report", "used templated summary (LLM call failed or timed out)")
 
     state["final_summary_report"] = llm_generated_content
     print("--- Summary Report Node Completed ---")
     return state
 
-# --- Helper for serialization ---
-def serialize_state(obj):
-    if hasattr(obj, 'dict'): # Common for Pydantic models
-        return obj.dict()
-    elif hasattr(obj, 'to_dict'): # Custom to_dict method
-        return obj.to_dict()
-    elif isinstance(obj, list):
-        return [serialize_state(item) for item in obj]
-    elif isinstance(obj, dict):
-        return {key: serialize_state(value) for key, value in obj.items()}
-    elif hasattr(obj, '__dict__') and not isinstance(obj, (str, int, float, bool, type(None))):
-        return {key: serialize_state(value) for key, value in obj.__dict__.items()}
-    return obj
\ No newline at end of file
+def templated_summary(state: AgentState, reason: str) -> str:
+    """
+    Summary built from the computed aggregates alone, for when the LLM summary cannot be afforded or fails.
+    `reason` completes the closing note ("... generated from a template because <reason>.").
+    """
+    score_summary = state["score_summary"]
+    subject_breakdown = (state.get("subject_performance") or {}).get("subject_breakdown") or {}
+    if not subject_breakdown:
+        subject_breakdown = local_subject_performance(state.get("evaluation_results", []))["subject_breakdown"]
+    strong = [s for s, d in subject_breakdown.items() if str(d.get("status", "")).lower() in ("strong", "excellent")]
+    weak = [s for s, d in subject_breakdown.items() if s not in strong]
+
+    mindset_lines = []
+    for insight in state.get("mindset_insights", []):
+        insight = insight.dict() if isinstance(insight, BaseModel) else insight
+        mindset_lines.append(f"- **QID {insight.get('question_id')}:** {insight.get('improvement_suggestion', '')}")
+    mindset_section = "### Key Fixes from Wrong Answers\n" + "\n".join(mindset_lines) if mindset_lines else ""
+
+    return FALLBACK_SUMMARY_TEMPLATE.format(
+        total_questions=score_summary["total_questions"],
+        attempted=score_summary["attempted"],
+        correct=score_summary["correct"],
+        wrong=score_summary["wrong"],
+        unattempted=score_summary["unattempted"],
+        strong_subjects=", ".join(strong) or "None yet",
+        weak_subjects=", ".join(weak) or "your weaker topics",
+        mindset_section=mindset_section,
+        reason=reason
+    )
\ No newline at end of file
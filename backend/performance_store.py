@@ -0,0 +1,266 @@
+# performance_store.py
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from aggregates import STATUSES, compute_score_summary, compute_subject_counts
+
+# --- Settings ---
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "performance.db")
+EWMA_ALPHA = 0.5 # Weight of the newest mock test in the smoothed accuracy
+TREND_THRESHOLD = 1.0 # Accuracy points per mock test before a subject counts as improving/declining
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    student_id TEXT PRIMARY KEY,
+    submissions INTEGER NOT NULL,
+    total_questions INTEGER NOT NULL,
+    attempted INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    wrong INTEGER NOT NULL,
+    unattempted INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id TEXT NOT NULL,
+    sequence INTEGER NOT NULL,
+    submitted_at TEXT NOT NULL,
+    total_questions INTEGER NOT NULL,
+    attempted INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    wrong INTEGER NOT NULL,
+    unattempted INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS subject_results (
+    submission_id INTEGER NOT NULL,
+    student_id TEXT NOT NULL,
+    sequence INTEGER NOT NULL,
+    subject TEXT NOT NULL,
+    total_questions INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    wrong INTEGER NOT NULL,
+    unattempted INTEGER NOT NULL,
+    accuracy REAL
+);
+CREATE INDEX IF NOT EXISTS idx_subject_results_student ON subject_results (student_id, subject, sequence);
+CREATE TABLE IF NOT EXISTS subject_aggregates (
+    student_id TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    submissions INTEGER NOT NULL,
+    total_questions INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    wrong INTEGER NOT NULL,
+    unattempted INTEGER NOT NULL,
+    last_accuracy REAL,
+    ewma_accuracy REAL,
+    trend_points INTEGER NOT NULL,
+    sum_x REAL NOT NULL,
+    sum_y REAL NOT NULL,
+    sum_xy REAL NOT NULL,
+    sum_xx REAL NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (student_id, subject)
+);
+"""
+
+def _trend_slope(points: int, sum_x: float, sum_y: float, sum_xy: float, sum_xx: float) -> Optional[float]:
+    """
+    Least-squares slope of accuracy over the student's mock-test sequence, from running sums.
+    """
+    if points < 2:
+        return None
+    denominator = points * sum_xx - sum_x * sum_x
+    if denominator == 0:
+        return None
+    return (points * sum_xy - sum_x * sum_y) / denominator
+
+def _trend_label(slope: Optional[float]) -> str:
+    if slope is None:
+        return "Insufficient data"
+    if slope > TREND_THRESHOLD:
+        return "Improving"
+    if slope < -TREND_THRESHOLD:
+        return "Declining"
+    return "Stable"
+
+def _rate(numerator: int, denominator: int) -> float:
+    return round(numerator / denominator * 100, 2) if denominator > 0 else 0
+
+class PerformanceStore:
+    """
+    Local SQLite store of per-student evaluation results across mock tests.
+    Per-subject aggregates are updated in place on every submission, so reads never replay history.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def record_submission(self, student_id: str, evaluation_results: List[Dict[str, Any]], total_questions: int) -> Optional[int]:
+        """
+        Stores one mock test and folds it into the student's running aggregates. Returns the submission's sequence number,
+        or None when no question could be evaluated.
+        Questions whose evaluation failed (status "Unknown") say nothing about the student and are left out.
+        """
+        decided_results = [r for r in evaluation_results if r.get("status") in STATUSES]
+        undecided = len(evaluation_results) - len(decided_results)
+        if not decided_results:
+            print(f"⚠️ Not recording submission for student {student_id}: no question was evaluated")
+            return None
+        if undecided:
+            print(f"⚠️ Leaving {undecided} unevaluated question(s) out of the history of student {student_id}")
+        evaluation_results = decided_results
+        total_questions = max(0, total_questions - undecided)
+
+        now = datetime.now(timezone.utc).isoformat()
+        score_summary = compute_score_summary(evaluation_results, total_questions)
+        subject_counts = compute_subject_counts(evaluation_results)
+
+        conn = self._connect()
+        try:
+            # Take the write lock up front so concurrent workers cannot interleave sequence numbers
+            conn.execute("BEGIN IMMEDIATE")
+            student = conn.execute("SELECT submissions FROM students WHERE student_id = ?", (student_id,)).fetchone()
+            sequence = (student["submissions"] if student else 0) + 1
+
+            conn.execute(
+                """INSERT INTO students (student_id, submissions, total_questions, attempted, correct, wrong, unattempted, updated_at)
+                   VALUES (?, 1, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (student_id) DO UPDATE SET
+                       submissions = submissions + 1,
+                       total_questions = total_questions + excluded.total_questions,
+                       attempted = attempted + excluded.attempted,
+                       correct = correct + excluded.correct,
+                       wrong = wrong + excluded.wrong,
+                       unattempted = unattempted + excluded.unattempted,
+                       updated_at = excluded.updated_at""",
+                (student_id, score_summary["total_questions"], score_summary["attempted"], score_summary["correct"],
+                 score_summary["wrong"], score_summary["unattempted"], now)
+            )
+            submission_id = conn.execute(
+                """INSERT INTO submissions (student_id, sequence, submitted_at, total_questions, attempted, correct, wrong, unattempted)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (student_id, sequence, now, score_summary["total_questions"], score_summary["attempted"],
+                 score_summary["correct"], score_summary["wrong"], score_summary["unattempted"])
+            ).lastrowid
+
+            for counts in subject_counts:
+                attempted = counts["correct"] + counts["wrong"]
+                accuracy = counts["accuracy"] if attempted > 0 else None
+                conn.execute(
+                    """INSERT INTO subject_results (submission_id, student_id, sequence, subject, total_questions, correct, wrong, unattempted, accuracy)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (submission_id, student_id, sequence, counts["subject"], counts["total_questions"],
+                     counts["correct"], counts["wrong"], counts["unattempted"], accuracy)
+                )
+                self._update_subject_aggregate(conn, student_id, sequence, counts, accuracy, now)
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return sequence
+
+    def _update_subject_aggregate(self, conn: sqlite3.Connection, student_id: str, sequence: int,
+                                  counts: Dict[str, Any], accuracy: Optional[float], now: str) -> None:
+        row = conn.execute(
+            "SELECT * FROM subject_aggregates WHERE student_id = ? AND subject = ?", (student_id, counts["subject"])
+        ).fetchone()
+        aggregate = dict(row) if row else {
+            "submissions": 0, "total_questions": 0, "correct": 0, "wrong": 0, "unattempted": 0,
+            "last_accuracy": None, "ewma_accuracy": None,
+            "trend_points": 0, "sum_x": 0.0, "sum_y": 0.0, "sum_xy": 0.0, "sum_xx": 0.0,
+        }
+
+        aggregate["submissions"] += 1
+        for key in ("total_questions", "correct", "wrong", "unattempted"):
+            aggregate[key] += counts[key]
+
+        # Subjects with nothing attempted this time carry no accuracy signal for the trend
+        if accuracy is not None:
+            aggregate["last_accuracy"] = accuracy
+            previous = aggregate["ewma_accuracy"]
+            aggregate["ewma_accuracy"] = accuracy if previous is None else EWMA_ALPHA * accuracy + (1 - EWMA_ALPHA) * previous
+            aggregate["trend_points"] += 1
+            aggregate["sum_x"] += sequence
+            aggregate["sum_y"] += accuracy
+            aggregate["sum_xy"] += sequence * accuracy
+            aggregate["sum_xx"] += sequence * sequence
+
+        conn.execute(
+            """INSERT OR REPLACE INTO subject_aggregates
+               (student_id, subject, submissions, total_questions, correct, wrong, unattempted, last_accuracy, ewma_accuracy,
+                trend_points, sum_x, sum_y, sum_xy, sum_xx, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (student_id, counts["subject"], aggregate["submissions"], aggregate["total_questions"], aggregate["correct"],
+             aggregate["wrong"], aggregate["unattempted"], aggregate["last_accuracy"], aggregate["ewma_accuracy"],
+             aggregate["trend_points"], aggregate["sum_x"], aggregate["sum_y"], aggregate["sum_xy"], aggregate["sum_xx"], now)
+        )
+
+    def get_trends(self, student_id: str, include_history: bool = False) -> Dict[str, Any]:
+        """
+        Returns the precomputed overall and per-subject aggregates for a student.
+        include_history adds the per-test accuracy series for each subject.
+        """
+        with closing(self._connect()) as conn:
+            student = conn.execute("SELECT * FROM students WHERE student_id = ?", (student_id,)).fetchone()
+            if not student:
+                return {"student_id": student_id, "submissions": 0, "overall": {}, "subjects": {}}
+
+            subjects = {}
+            for row in conn.execute("SELECT * FROM subject_aggregates WHERE student_id = ? ORDER BY subject", (student_id,)):
+                attempted = row["correct"] + row["wrong"]
+                slope = _trend_slope(row["trend_points"], row["sum_x"], row["sum_y"], row["sum_xy"], row["sum_xx"])
+                subjects[row["subject"]] = {
+                    "submissions": row["submissions"],
+                    "total_questions": row["total_questions"],
+                    "correct": row["correct"],
+                    "wrong": row["wrong"],
+                    "unattempted": row["unattempted"],
+                    "accuracy": _rate(row["correct"], attempted),
+                    "attempt_rate": _rate(attempted, row["total_questions"]),
+                    "last_accuracy": row["last_accuracy"],
+                    "ewma_accuracy": round(row["ewma_accuracy"], 2) if row["ewma_accuracy"] is not None else None,
+                    "trend_slope": round(slope, 2) if slope is not None else None,
+                    "trend": _trend_label(slope),
+                }
+
+            if include_history:
+                for row in conn.execute(
+                    """SELECT subject, sequence, total_questions, correct, wrong, unattempted, accuracy
+                       FROM subject_results WHERE student_id = ? ORDER BY subject, sequence""",
+                    (student_id,)
+                ):
+                    subjects[row["subject"]].setdefault("history", []).append({
+                        "sequence": row["sequence"], "total_questions": row["total_questions"], "correct": row["correct"],
+                        "wrong": row["wrong"], "unattempted": row["unattempted"], "accuracy": row["accuracy"]
+                    })
+
+        return {
+            "student_id": student_id,
+            "submissions": student["submissions"],
+            "overall": {
+                "total_questions": student["total_questions"],
+                "attempted": student["attempted"],
+                "correct": student["correct"],
+                "wrong": student["wrong"],
+                "unattempted": student["unattempted"],
+                "accuracy": _rate(student["correct"], student["attempted"]),
+                "attempt_rate": _rate(student["attempted"], student["total_questions"]),
+            },
+            "subjects": subjects,
+        }
+
+# --- Default Store ---
+performance_store = PerformanceStore(os.getenv("PERFORMANCE_DB_PATH", DEFAULT_DB_PATH))
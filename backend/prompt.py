@@ -1,11 +1,4 @@
 # --- Prompts (Updated to the latest refined versions) ---
-PLAN_PROMPT = """You are an expert exam analyst tasked with evaluating a student's UPSC Prelims performance. \ 
- Begin by outlining the overall approach you will take to analyze the student's answers. \ 
- Your outline should cover how you will classify responses (correct, wrong, unattempted), \ 
- how you will infer mindset for wrong answers, identify patterns in unattempted questions, \ 
- and how subject-wise performance will be measured. \ 
- Include any relevant notes or instructions that help guide this analysis process.""" 
-
 LLM_SUBJECT_PROMPT = """You are a subject classification expert for UPSC prelims questions.
 Given a multiple-choice question, identify the most relevant subject it belongs to.
 
@@ -139,15 +132,15 @@ SUMMARY_PROMPT = """You are an expert UPSC exam analyst tasked with writing a co
  - Subject-wise performance breakdown (accuracy and counts)
  - Detailed insights into why the student chose wrong answers (mindset analysis, including depth of knowledge and distractor analysis)
  - Possible reasons for unattempted questions
- - Additional relevant references or recent information (optional)
+ - The student's performance history across previous mock tests (optional)
 
  Your task is to write a clear, motivating, and realistic summary report that includes:
  - A high-level overview of the student's performance
  - Strengths and subjects where the student excelled
  - Weaknesses and subjects needing improvement
  - Behavioral patterns noticed (e.g., tendency to skip certain topics, common misconceptions)
+ - If history is available, how the student is trending in each subject compared to previous mock tests
  - Suggestions for focused study and improvement strategies
- - If available, include up-to-date relevant references or resources to support the student’s preparation
 - **FINALLY, A CRUCIAL 'Actionable Plan for Next Time' section.** This final section is paramount. It MUST be detailed and provide clear guidance on areas like conceptual clarity, revision techniques, time management, and subject-specific focus.
  Write the full summary below in an encouraging tone suitable for a UPSC aspirant.
 
@@ -175,10 +168,26 @@ Based on the provided data, here is a comprehensive analysis of the student's pe
  Unattempted Questions Analysis:
  {unattempted_reasons}
 
- Additional References:
- {references}
+ Performance History Across Previous Mock Tests (per-subject accuracy, attempt rate and trend):
+ {student_history}
 
 ## Actionable Plan for Next Time:
 **Based on ALL the preceding analysis and data, provide a comprehensive, specific, and actionable set of recommendations for the student's future preparation. This section is the most important part of the report for the student's improvement. It MUST be detailed and provide clear guidance on areas like conceptual clarity, revision techniques, time management, and subject-specific focus.**
 """
+# Used instead of SUMMARY_PROMPT when there is no time left for the LLM (see deadline.py)
+FALLBACK_SUMMARY_TEMPLATE = """## Overall Performance Summary:
+You attempted {attempted} of {total_questions} questions: {correct} correct, {wrong} wrong and {unattempted} left unattempted.
+
+**Strong subjects:** {strong_subjects}
+**Subjects needing improvement:** {weak_subjects}
+
+{mindset_section}
+
+## Actionable Plan for Next Time:
+- Revise the core concepts of {weak_subjects} first, using the mindset insights above for the specific gaps.
+- Re-attempt the questions you got wrong and note why the chosen option was tempting.
+- Practise timed mock tests to bring down the number of unattempted questions.
+
+_This summary was generated from a template because {reason}._
+"""
 # --- End of Prompts ---
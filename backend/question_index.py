@@ -0,0 +1,249 @@
+# question_index.py
+# Near-duplicate question index (MinHash + LSH) for reusing subject tags and mindset insights
+# across paraphrased questions.
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import closing
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, FrozenSet, List, Optional, Tuple
+
+# --- Settings ---
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "question_index.db")
+# Minimum Jaccard similarity (word shingles) for a stored question to count as the same question
+DEFAULT_THRESHOLD = float(os.getenv("QUESTION_INDEX_THRESHOLD", "0.75"))
+NUM_BINS = 32 # Signature length
+BANDS = 8 # 8 bands x 4 rows: candidates from roughly 0.6 similarity, verified exactly afterwards
+ROWS = NUM_BINS // BANDS
+_DENSIFY_OFFSET = 1 << 58 # Keeps borrowed bin values apart from real ones
+LATENCY_WINDOW = 1000 # Recent lookups kept per consumer for the latency percentiles
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    question_key TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    options TEXT NOT NULL,
+    correct_option TEXT NOT NULL,
+    subject TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS insights (
+    question_key TEXT NOT NULL,
+    chosen_option_text TEXT NOT NULL,
+    insight TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (question_key, chosen_option_text)
+);
+"""
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+def _normalize(text: str) -> str:
+    return " ".join(_WORD_PATTERN.findall(str(text).lower()))
+
+def _shingles(text: str) -> FrozenSet[str]:
+    # Unigrams keep small insertions/deletions cheap, bigrams keep word order in play
+    words = _normalize(text).split()
+    return frozenset(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+def _minhash(shingles: FrozenSet[str]) -> List[int]:
+    """
+    One-permutation MinHash: each shingle is hashed once and kept as the minimum of one of
+    NUM_BINS bins, so the cost is one hash per shingle rather than one per shingle and permutation.
+    Empty bins borrow the next non-empty bin's value (rotation densification).
+    """
+    bins: List[Optional[int]] = [None] * NUM_BINS
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        k, value = h % NUM_BINS, h // NUM_BINS
+        if bins[k] is None or value < bins[k]:
+            bins[k] = value
+    if all(b is None for b in bins):
+        return [0] * NUM_BINS
+    signature = []
+    for k in range(NUM_BINS):
+        distance = 0
+        while bins[(k + distance) % NUM_BINS] is None:
+            distance += 1
+        signature.append(bins[(k + distance) % NUM_BINS] + distance * _DENSIFY_OFFSET)
+    return signature
+
+def _bands(signature: List[int]) -> List[Tuple[int, Tuple[int, ...]]]:
+    return [(band, tuple(signature[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def _option_text(question: Dict[str, Any], label: Optional[str]) -> str:
+    return _normalize(question.get("options", {}).get(label, "")) if label else ""
+
+def _same_options(a: Dict[str, str], b: Dict[str, str]) -> bool:
+    # Same option text under every label
+    return {label: _normalize(text) for label, text in a.items()} == {label: _normalize(text) for label, text in b.items()}
+
+def _question_key(question: Dict[str, Any]) -> str:
+    return hashlib.sha1(_normalize(question.get("text", "")).encode("utf-8")).hexdigest()
+
+def _latency_percentiles(latencies: Deque[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    if not ordered:
+        return {}
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 1)
+    return {"last": round(latencies[-1], 1), "p50": pick(0.50), "p99": pick(0.99), "max": round(ordered[-1], 1)}
+
+class QuestionIndex:
+    """
+    In-memory MinHash/LSH index over the question bank, persisted in SQLite.
+    Candidates from the LSH buckets are verified with the exact Jaccard similarity.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, threshold: float = DEFAULT_THRESHOLD):
+        self.db_path = db_path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._insights: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], set] = {}
+        self._stats = {
+            name: {"lookups": 0, "hits": 0, "lookup_us_total": 0.0, "recent_us": deque(maxlen=LATENCY_WINDOW)}
+            for name in ("subject_tagging", "mindset")
+        }
+
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            conn.executescript(SCHEMA)
+            for key, text, options, correct_option, subject in conn.execute(
+                "SELECT question_key, text, options, correct_option, subject FROM questions"
+            ):
+                self._add_entry(key, {"text": text, "options": json.loads(options), "correct_option": correct_option}, subject)
+            for key, chosen_text, insight in conn.execute("SELECT question_key, chosen_option_text, insight FROM insights"):
+                self._insights[(key, chosen_text)] = json.loads(insight)
+
+    def _add_entry(self, key: str, question: Dict[str, Any], subject: Optional[str]) -> None:
+        shingles = _shingles(question.get("text", ""))
+        if key not in self._entries:
+            for band in _bands(_minhash(shingles)):
+                self._buckets.setdefault(band, set()).add(key)
+        self._entries[key] = {
+            "shingles": shingles,
+            "options": question.get("options", {}),
+            "correct_text": _option_text(question, question.get("correct_option")),
+            "subject": subject,
+        }
+
+    def find_similar(self, text: str) -> List[Tuple[str, float]]:
+        """
+        Returns (question_key, similarity) for stored questions above the threshold, most similar first.
+        """
+        shingles = _shingles(text)
+        candidates = set()
+        for band in _bands(_minhash(shingles)):
+            candidates.update(self._buckets.get(band, ()))
+        matches = [(key, _jaccard(shingles, self._entries[key]["shingles"])) for key in candidates]
+        return sorted([m for m in matches if m[1] >= self.threshold], key=lambda m: m[1], reverse=True)
+
+    def _matches(self, question: Dict[str, Any]) -> List[str]:
+        # Same question only if the correct answer is the same option text
+        correct_text = _option_text(question, question.get("correct_option"))
+        return [key for key, _ in self.find_similar(question.get("text", ""))
+                if self._entries[key]["correct_text"] == correct_text]
+
+    def _record_lookup(self, name: str, hit: bool, started: float) -> None:
+        stats = self._stats[name]
+        stats["lookups"] += 1
+        stats["hits"] += hit
+        elapsed_us = (time.perf_counter() - started) * 1e6
+        stats["lookup_us_total"] += elapsed_us
+        stats["recent_us"].append(elapsed_us)
+
+    def lookup_subject(self, question: Dict[str, Any]) -> Optional[str]:
+        started = time.perf_counter()
+        with self._lock:
+            subject = next((self._entries[key]["subject"] for key in self._matches(question) if self._entries[key]["subject"]), None)
+            self._record_lookup("subject_tagging", subject is not None, started)
+        return subject
+
+    def lookup_insight(self, question: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Returns a stored mindset insight for a paraphrase with the same correct and chosen options
+        under the same labels. The insight's free text names options by label, so a paraphrase with
+        reordered options is a miss.
+        """
+        started = time.perf_counter()
+        chosen_text = _option_text(question, question.get("chosen_option"))
+        with self._lock:
+            insight = None
+            for key in self._matches(question):
+                stored = self._insights.get((key, chosen_text))
+                if stored is not None and _same_options(self._entries[key]["options"], question.get("options", {})):
+                    insight = {**stored, "question_id": question["id"]}
+                    break
+            self._record_lookup("mindset", insight is not None, started)
+        return insight
+
+    def add_subject(self, question: Dict[str, Any], subject: str) -> bool:
+        """
+        Indexes the question's subject. Returns False when it was already indexed with this subject.
+        """
+        key = _question_key(question)
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            if key in self._entries and self._entries[key]["subject"] == subject:
+                return False # Already indexed with this tag; skip the write
+            self._add_entry(key, question, subject)
+            with closing(sqlite3.connect(self.db_path, timeout=30)) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO questions (question_key, text, options, correct_option, subject, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, question.get("text", ""), json.dumps(question.get("options", {})), question.get("correct_option", ""), subject, now)
+                )
+        return True
+
+    def add_insight(self, question: Dict[str, Any], insight: Dict[str, Any]) -> None:
+        key = _question_key(question)
+        chosen_text = _option_text(question, question.get("chosen_option"))
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            subject = self._entries[key]["subject"] if key in self._entries else question.get("subject")
+            self._add_entry(key, question, subject)
+            self._insights[(key, chosen_text)] = insight
+            with closing(sqlite3.connect(self.db_path, timeout=30)) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO questions (question_key, text, options, correct_option, subject, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, question.get("text", ""), json.dumps(question.get("options", {})), question.get("correct_option", ""), subject, now)
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO insights (question_key, chosen_option_text, insight, updated_at) VALUES (?, ?, ?, ?)",
+                    (key, chosen_text, json.dumps(insight), now)
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Hit-rate statistics for this process since startup, with per-lookup latency
+        percentiles over the last LATENCY_WINDOW lookups.
+        """
+        with self._lock:
+            result = {
+                "indexed_questions": len(self._entries),
+                "indexed_insights": len(self._insights),
+                "threshold": self.threshold,
+            }
+            for name, stats in self._stats.items():
+                lookups = stats["lookups"]
+                result[name] = {
+                    "lookups": lookups,
+                    "hits": stats["hits"],
+                    "hit_rate": round(stats["hits"] / lookups * 100, 2) if lookups else 0,
+                    "avg_lookup_us": round(stats["lookup_us_total"] / lookups, 1) if lookups else 0,
+                    "lookup_us": _latency_percentiles(stats["recent_us"]),
+                }
+        return result
+
+# --- Default Index ---
+question_index = QuestionIndex(os.getenv("QUESTION_INDEX_DB_PATH", DEFAULT_DB_PATH))
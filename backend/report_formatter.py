@@ -1,107 +1,257 @@
-from typing import Any, Dict, List
+from html import escape
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 
-def format_final_state_for_display(result: Dict[str, Any]) -> str:
+from aggregates import compute_score_summary
+from serializer import dumps
+
+# --- Sections and Formats ---
+# Sections are rendered in this order; "summary" is the LLM-generated report.
+SECTIONS = ("summary", "key_metrics", "subject_performance", "mindset_insights", "unattempted_analysis")
+# The API returns the LLM report separately, so the display rendering leaves it out.
+DISPLAY_SECTIONS = SECTIONS[1:]
+FORMATS = ("markdown", "html", "json")
+MIMETYPES = {"markdown": "text/markdown", "html": "text/html", "json": "application/x-ndjson"}
+
+def validate_report_options(fmt: str, sections: Optional[Iterable[str]] = None) -> List[str]:
     """
-    Formats the final_state dictionary (which is 'result' here) into a readable Markdown string for display.
+    Checks the requested format and sections, returning the sections in render order.
+    Raises ValueError for anything unknown.
     """
-    markdown_output = []
-
-    markdown_output.append("# UPSC Exam Performance Analysis Report\n")
-    markdown_output.append("\n---\n")
-
-    # 1. Key Metrics - Directly extracted from evaluation_results
-    markdown_output.append("## Key Performance Metrics\n")
-    total_questions = len(result.get("all_questions", []))
-    evaluated_results = result.get("evaluation_results", [])
-    correct_count = sum(1 for r in evaluated_results if r.get("status") == "Correct")
-    wrong_count = sum(1 for r in evaluated_results if r.get("status") == "Wrong")
-    unattempted_count = sum(1 for r in evaluated_results if r.get("status") == "Unattempted")
-    attempted_count = correct_count + wrong_count
-
-    markdown_output.append(f"- **Total Questions:** {total_questions}")
-    markdown_output.append(f"- **Attempted:** {attempted_count}")
-    markdown_output.append(f"- **Correct:** {correct_count}")
-    markdown_output.append(f"- **Wrong:** {wrong_count}")
-    markdown_output.append(f"- **Unattempted:** {unattempted_count}\n")
-    markdown_output.append("\n---\n")
-
-    # 2. Subject-wise Performance
-    markdown_output.append("## Subject-wise Performance Breakdown\n")
-    subject_performance = result.get("subject_performance", {})
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown report format '{fmt}'. Expected one of: {', '.join(FORMATS)}")
+    if sections is None:
+        return list(SECTIONS)
+    requested = set(sections)
+    unknown = requested.difference(SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown report sections: {', '.join(sorted(unknown))}")
+    return [name for name in SECTIONS if name in requested]
+
+# --- Section Data ---
+# Each builder pulls one section's data out of the (raw or serialized) final state.
+def _summary_data(result: Dict[str, Any]) -> str:
+    return result.get("final_summary_report", "")
+
+def _key_metrics_data(result: Dict[str, Any]) -> Dict[str, int]:
+    # Prefer the counts summary_report_node already computed
+    score_summary = result.get("score_summary")
+    if score_summary:
+        return score_summary
+    return compute_score_summary(result.get("evaluation_results", []), len(result.get("all_questions", [])))
+
+def _subject_performance_data(result: Dict[str, Any]) -> Dict[str, Any]:
+    return result.get("subject_performance", {})
+
+def _mindset_insights_data(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [insight.dict() if hasattr(insight, "dict") else insight for insight in result.get("mindset_insights", [])]
+
+def _unattempted_analysis_data(result: Dict[str, Any]) -> Dict[str, Any]:
+    return result.get("unattempted_reasons", {})
+
+SECTION_DATA: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "summary": _summary_data,
+    "key_metrics": _key_metrics_data,
+    "subject_performance": _subject_performance_data,
+    "mindset_insights": _mindset_insights_data,
+    "unattempted_analysis": _unattempted_analysis_data,
+}
+
+# --- Markdown ---
+def _markdown_summary(summary: str) -> str:
+    return f"## Summary Report\n\n{summary or 'Analysis report could not be generated.'}\n\n---\n"
+
+def _markdown_key_metrics(metrics: Dict[str, int]) -> str:
+    lines = ["## Key Performance Metrics\n"]
+    lines.append(f"- **Total Questions:** {metrics.get('total_questions', 0)}")
+    lines.append(f"- **Attempted:** {metrics.get('attempted', 0)}")
+    lines.append(f"- **Correct:** {metrics.get('correct', 0)}")
+    lines.append(f"- **Wrong:** {metrics.get('wrong', 0)}")
+    lines.append(f"- **Unattempted:** {metrics.get('unattempted', 0)}\n")
+    lines.append("\n---\n")
+    return "\n".join(lines)
+
+def _markdown_subject_performance(subject_performance: Dict[str, Any]) -> str:
+    lines = ["## Subject-wise Performance Breakdown\n"]
     if subject_performance:
-        markdown_output.append(f"**Overall Subject Insights:** {subject_performance.get('overall_insights', 'N/A')}\n")
-        markdown_output.append("### Detailed Subject Breakdown\n")
+        lines.append(f"**Overall Subject Insights:** {subject_performance.get('overall_insights', 'N/A')}\n")
+        lines.append("### Detailed Subject Breakdown\n")
         for subject, data in subject_performance.get("subject_breakdown", {}).items():
-            markdown_output.append(f"#### {subject}\n")
-            markdown_output.append(f"- Total Questions: {data.get('total_questions', 'N/A')}")
-            markdown_output.append(f"- Correct: {data.get('correct', 'N/A')}")
-            markdown_output.append(f"- Wrong: {data.get('wrong', 'N/A')}")
-            markdown_output.append(f"- Unattempted: {data.get('unattempted', 'N/A')}")
-            markdown_output.append(f"- Accuracy: {data.get('accuracy', 'N/A')}%")
-            markdown_output.append(f"- Status: **{data.get('status', 'N/A')}**\n")
-
-        markdown_output.append(f"**Behavioral Patterns across Subjects:** {subject_performance.get('behavioral_patterns', 'N/A')}\n")
+            lines.append(f"#### {subject}\n")
+            lines.append(f"- Total Questions: {data.get('total_questions', 'N/A')}")
+            lines.append(f"- Correct: {data.get('correct', 'N/A')}")
+            lines.append(f"- Wrong: {data.get('wrong', 'N/A')}")
+            lines.append(f"- Unattempted: {data.get('unattempted', 'N/A')}")
+            lines.append(f"- Accuracy: {data.get('accuracy', 'N/A')}%")
+            lines.append(f"- Status: **{data.get('status', 'N/A')}**\n")
+        lines.append(f"**Behavioral Patterns across Subjects:** {subject_performance.get('behavioral_patterns', 'N/A')}\n")
     else:
-        markdown_output.append("No subject performance data available.\n")
-    markdown_output.append("\n---\n")
+        lines.append("No subject performance data available.\n")
+    lines.append("\n---\n")
+    return "\n".join(lines)
 
-    # 3. Detailed Mindset Insights (Wrong Answers)
-    markdown_output.append("## Detailed Mindset Insights (Wrong Answers)\n")
-    mindset_insights = result.get("mindset_insights", [])
+def _markdown_mindset_insights(mindset_insights: List[Dict[str, Any]]) -> str:
+    lines = ["## Detailed Mindset Insights (Wrong Answers)\n"]
     if mindset_insights:
         for i, insight in enumerate(mindset_insights):
-            # Assuming insights are now dictionaries after serialization
-            question_id = insight.get("question_id", "N/A")
-            chosen_option_analysis = insight.get("chosen_option_analysis", "N/A")
-            depth_of_knowledge_assessment = insight.get("depth_of_knowledge_assessment", "N/A")
-            distractor_analysis = insight.get("distractor_analysis", {})
-            improvement_suggestion = insight.get("improvement_suggestion", "N/A")
-
-            markdown_output.append(f"### Question ID: {question_id}\n")
-            markdown_output.append(f"- **Chosen Option Analysis:** {chosen_option_analysis}\n")
-            markdown_output.append(f"- **Depth of Knowledge Assessment:** {depth_of_knowledge_assessment}\n")
-
+            lines.append(f"### Question ID: {insight.get('question_id', 'N/A')}\n")
+            lines.append(f"- **Chosen Option Analysis:** {insight.get('chosen_option_analysis', 'N/A')}\n")
+            lines.append(f"- **Depth of Knowledge Assessment:** {insight.get('depth_of_knowledge_assessment', 'N/A')}\n")
+            distractor_analysis = insight.get("distractor_analysis") or {}
             if distractor_analysis:
-                markdown_output.append("- **Distractor Analysis:**\n")
+                lines.append("- **Distractor Analysis:**\n")
                 for opt in sorted(distractor_analysis.keys()):
-                    analysis = distractor_analysis[opt]
-                    markdown_output.append(f"  - **Option {opt}:** {analysis}\n")
-
-            markdown_output.append(f"- **Improvement Suggestion:** {improvement_suggestion}\n")
+                    lines.append(f"  - **Option {opt}:** {distractor_analysis[opt]}\n")
+            lines.append(f"- **Improvement Suggestion:** {insight.get('improvement_suggestion', 'N/A')}\n")
             if i < len(mindset_insights) - 1:
-                markdown_output.append("---\n")
+                lines.append("---\n")
     else:
-        markdown_output.append("No specific mindset insights for wrong answers.\n")
-    markdown_output.append("\n---\n")
+        lines.append("No specific mindset insights for wrong answers.\n")
+    lines.append("\n---\n")
+    return "\n".join(lines)
 
-    # 4. Unattempted Questions Analysis
-    markdown_output.append("## Unattempted Questions Analysis\n")
-    unattempted_reasons = result.get("unattempted_reasons", {})
+def _markdown_unattempted_analysis(unattempted_reasons: Dict[str, Any]) -> str:
+    lines = ["## Unattempted Questions Analysis\n"]
     if unattempted_reasons:
-        markdown_output.append(f"**Overall Summary:** {unattempted_reasons.get('overall_summary', 'N/A')}\n")
+        lines.append(f"**Overall Summary:** {unattempted_reasons.get('overall_summary', 'N/A')}\n")
         individual_reasons = unattempted_reasons.get("individual_reasons", [])
         if individual_reasons:
-            markdown_output.append("### Individual Reasons for Skipping:\n")
+            lines.append("### Individual Reasons for Skipping:\n")
             for reason in individual_reasons:
-                markdown_output.append(f"- **QID {reason.get('question_id', 'N/A')}:** {reason.get('reason_for_skipping', 'N/A')}\n")
+                lines.append(f"- **QID {reason.get('question_id', 'N/A')}:** {reason.get('reason_for_skipping', 'N/A')}\n")
+    else:
+        lines.append("No unattempted questions analysis available.\n")
+    lines.append("\n---\n")
+    return "\n".join(lines)
+
+MARKDOWN_RENDERERS: Dict[str, Callable[[Any], str]] = {
+    "summary": _markdown_summary,
+    "key_metrics": _markdown_key_metrics,
+    "subject_performance": _markdown_subject_performance,
+    "mindset_insights": _markdown_mindset_insights,
+    "unattempted_analysis": _markdown_unattempted_analysis,
+}
+
+# --- HTML ---
+def _html_list(items: Iterable[str]) -> str:
+    return "<ul>" + "".join(f"<li>{item}</li>" for item in items) + "</ul>"
+
+def _html_summary(summary: str) -> str:
+    # The LLM report is markdown; keep it verbatim for the client to render
+    body = escape(summary or "Analysis report could not be generated.")
+    return f'<section id="summary"><h2>Summary Report</h2><pre class="summary-report">{body}</pre></section>'
+
+def _html_key_metrics(metrics: Dict[str, int]) -> str:
+    items = [
+        f"<strong>Total Questions:</strong> {metrics.get('total_questions', 0)}",
+        f"<strong>Attempted:</strong> {metrics.get('attempted', 0)}",
+        f"<strong>Correct:</strong> {metrics.get('correct', 0)}",
+        f"<strong>Wrong:</strong> {metrics.get('wrong', 0)}",
+        f"<strong>Unattempted:</strong> {metrics.get('unattempted', 0)}",
+    ]
+    return f'<section id="key_metrics"><h2>Key Performance Metrics</h2>{_html_list(items)}</section>'
+
+def _html_subject_performance(subject_performance: Dict[str, Any]) -> str:
+    parts = ['<section id="subject_performance"><h2>Subject-wise Performance Breakdown</h2>']
+    if subject_performance:
+        parts.append(f"<p><strong>Overall Subject Insights:</strong> {escape(str(subject_performance.get('overall_insights', 'N/A')))}</p>")
+        parts.append("<table><thead><tr><th>Subject</th><th>Total Questions</th><th>Correct</th><th>Wrong</th>"
+                     "<th>Unattempted</th><th>Accuracy</th><th>Status</th></tr></thead><tbody>")
+        for subject, data in subject_performance.get("subject_breakdown", {}).items():
+            cells = [subject] + [data.get(key, "N/A") for key in ("total_questions", "correct", "wrong", "unattempted")]
+            cells += [f"{data.get('accuracy', 'N/A')}%", data.get("status", "N/A")]
+            parts.append("<tr>" + "".join(f"<td>{escape(str(cell))}</td>" for cell in cells) + "</tr>")
+        parts.append("</tbody></table>")
+        parts.append(f"<p><strong>Behavioral Patterns across Subjects:</strong> {escape(str(subject_performance.get('behavioral_patterns', 'N/A')))}</p>")
     else:
-        markdown_output.append("No unattempted questions analysis available.\n")
-    markdown_output.append("\n---\n")
-    
-    # 5. Additional References (if any)
-    references = result.get("references", [])
-    if references:
-        markdown_output.append("## Additional References\n")
-        for ref in references:
-            markdown_output.append(f"- {ref}\n")
+        parts.append("<p>No subject performance data available.</p>")
+    parts.append("</section>")
+    return "".join(parts)
+
+def _html_mindset_insights(mindset_insights: List[Dict[str, Any]]) -> str:
+    parts = ['<section id="mindset_insights"><h2>Detailed Mindset Insights (Wrong Answers)</h2>']
+    if mindset_insights:
+        for insight in mindset_insights:
+            parts.append(f"<article><h3>Question ID: {escape(str(insight.get('question_id', 'N/A')))}</h3>")
+            items = [
+                f"<strong>Chosen Option Analysis:</strong> {escape(str(insight.get('chosen_option_analysis', 'N/A')))}",
+                f"<strong>Depth of Knowledge Assessment:</strong> {escape(str(insight.get('depth_of_knowledge_assessment', 'N/A')))}",
+            ]
+            distractor_analysis = insight.get("distractor_analysis") or {}
+            if distractor_analysis:
+                options = _html_list(
+                    f"<strong>Option {escape(str(opt))}:</strong> {escape(str(distractor_analysis[opt]))}"
+                    for opt in sorted(distractor_analysis.keys())
+                )
+                items.append(f"<strong>Distractor Analysis:</strong>{options}")
+            items.append(f"<strong>Improvement Suggestion:</strong> {escape(str(insight.get('improvement_suggestion', 'N/A')))}")
+            parts.append(_html_list(items) + "</article>")
+    else:
+        parts.append("<p>No specific mindset insights for wrong answers.</p>")
+    parts.append("</section>")
+    return "".join(parts)
+
+def _html_unattempted_analysis(unattempted_reasons: Dict[str, Any]) -> str:
+    parts = ['<section id="unattempted_analysis"><h2>Unattempted Questions Analysis</h2>']
+    if unattempted_reasons:
+        parts.append(f"<p><strong>Overall Summary:</strong> {escape(str(unattempted_reasons.get('overall_summary', 'N/A')))}</p>")
+        individual_reasons = unattempted_reasons.get("individual_reasons", [])
+        if individual_reasons:
+            parts.append("<h3>Individual Reasons for Skipping:</h3>")
+            parts.append(_html_list(
+                f"<strong>QID {escape(str(reason.get('question_id', 'N/A')))}:</strong> {escape(str(reason.get('reason_for_skipping', 'N/A')))}"
+                for reason in individual_reasons
+            ))
     else:
-        markdown_output.append("No additional references provided.\n")
-    markdown_output.append("\n---\n")
+        parts.append("<p>No unattempted questions analysis available.</p>")
+    parts.append("</section>")
+    return "".join(parts)
+
+HTML_RENDERERS: Dict[str, Callable[[Any], str]] = {
+    "summary": _html_summary,
+    "key_metrics": _html_key_metrics,
+    "subject_performance": _html_subject_performance,
+    "mindset_insights": _html_mindset_insights,
+    "unattempted_analysis": _html_unattempted_analysis,
+}
+
+# --- Rendering ---
+def render_report(result: Dict[str, Any], fmt: str = "markdown", sections: Optional[Iterable[str]] = None) -> Iterator[str]:
+    """
+    Yields the report one section at a time so callers can stream it or write it out incrementally.
+    "json" yields one {"section", "data"} object per line (NDJSON).
+    """
+    selected = validate_report_options(fmt, sections)
+
+    if fmt == "json":
+        for name in selected:
+            yield dumps({"section": name, "data": SECTION_DATA[name](result)}).decode() + "\n"
+        return
+
+    if fmt == "html":
+        yield '<article class="upsc-report"><h1>UPSC Exam Performance Analysis Report</h1>'
+        for name in selected:
+            yield HTML_RENDERERS[name](SECTION_DATA[name](result))
+        yield "</article>"
+        return
+
+    yield "# UPSC Exam Performance Analysis Report\n\n---\n"
+    for name in selected:
+        yield MARKDOWN_RENDERERS[name](SECTION_DATA[name](result))
+
+def render_report_data(result: Dict[str, Any], sections: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Structured (non-streamed) form of the "json" output: section name -> section data.
+    """
+    return {name: SECTION_DATA[name](result) for name in validate_report_options("json", sections)}
 
-    return "".join(markdown_output)
+def format_final_state_for_display(result: Dict[str, Any]) -> str:
+    """
+    Formats the final_state dictionary (which is 'result' here) into a readable Markdown string for display.
+    """
+    return "".join(render_report(result, "markdown", DISPLAY_SECTIONS))
 
 if __name__ == "__main__":
-    # Example usage for testing the function within this file
+    # Example usage for testing the renderer within this file
     # This 'result' dictionary should mimic the structure of your `final_state`
     # after it has been serialized (e.g., Pydantic models converted to dicts).
     sample_result = {
@@ -133,7 +283,8 @@ if __name__ == "__main__":
             "individual_reasons": [
                 {"question_id": "Q003", "reason_for_skipping": "Time constraint."}
             ]
-        },
-        "references": ["Book X", "Book Y"]
+        }
     }
-    formatted_output = format_final_state_for_display(sample_result)
\ No newline at end of file
+    formatted_output = format_final_state_for_display(sample_result)
+    html_sections = list(render_report(sample_result, "html", ["key_metrics", "mindset_insights"]))
+    json_lines = list(render_report(sample_result, "json"))
@@ -0,0 +1,98 @@
+# serializer.py
+import gzip
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+from pydantic.v1 import BaseModel
+
+from models import AgentState
+
+try:
+    import brotli # Optional: only used when the client accepts "br"
+except ImportError:
+    brotli = None
+
+# --- Schema ---
+# Keys are taken from AgentState so that anything a node stashes in the state
+# outside of the schema is not leaked into the response.
+STATE_KEYS = tuple(AgentState.__annotations__.keys())
+
+# Fields dropped from the compact payload: the client already sent the questions and its history,
+# the LLM report is returned separately, and the rest is loop state or always empty.
+COMPACT_DROPPED_KEYS = (
+    "all_questions", "current_question", "current_question_index",
+    "final_summary_report", "student_history",
+)
+
+# Payloads smaller than this are not worth the compression overhead.
+MIN_COMPRESS_BYTES = 1024
+
+def _default(obj: Any) -> Any:
+    """
+    Fallback hook for orjson: called only for values orjson cannot encode natively.
+    """
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def project_state(state: AgentState, compact: bool = False) -> Dict[str, Any]:
+    """
+    Returns a shallow view of the state restricted to the AgentState schema.
+    In compact mode the echoed questions are replaced by their ids.
+    """
+    projected = {key: state[key] for key in STATE_KEYS if key in state}
+    if compact:
+        projected["question_ids"] = [q.get("id") for q in state.get("all_questions", [])]
+        for key in COMPACT_DROPPED_KEYS:
+            projected.pop(key, None)
+    return projected
+
+def state_to_dict(state: AgentState, compact: bool = False) -> Dict[str, Any]:
+    """
+    Converts the final state into plain dicts/lists (pydantic models become dicts).
+    """
+    return orjson.loads(dumps_state(state, compact=compact))
+
+def dumps_state(state: AgentState, compact: bool = False) -> bytes:
+    """
+    Encodes the final state straight to JSON bytes without an intermediate deep copy.
+    """
+    return orjson.dumps(project_state(state, compact=compact), default=_default)
+
+def dumps(payload: Any) -> bytes:
+    return orjson.dumps(payload, default=_default)
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    """
+    Encodings from an Accept-Encoding header, leaving out any the client refuses with q=0.
+    """
+    accepted = set()
+    for token in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in token.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+def compress_payload(body: bytes, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+    """
+    Compresses the body according to the client's Accept-Encoding header.
+    Returns the (possibly unchanged) body and the Content-Encoding to send, if any.
+    """
+    if len(body) < MIN_COMPRESS_BYTES or not accept_encoding:
+        return body, None
+    accepted = _accepted_encodings(accept_encoding)
+    if "br" in accepted and brotli is not None:
+        return brotli.compress(body, quality=5), "br"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=6), "gzip"
+    return body, None
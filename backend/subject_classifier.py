@@ -0,0 +1,255 @@
+# subject_classifier.py
+# Local TF-IDF + multinomial logistic regression subject classifier.
+# Usage:
+#   python subject_classifier.py train    # retrain from the tagged-question dataset
+#   python subject_classifier.py report   # offline accuracy/latency against the LLM tags
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# --- Settings ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATASET_PATH = os.getenv("SUBJECT_DATASET_PATH", os.path.join(BASE_DIR, "subject_dataset.jsonl"))
+DEFAULT_MODEL_PATH = os.getenv("SUBJECT_MODEL_PATH", os.path.join(BASE_DIR, "subject_model.json"))
+# Predictions below this probability are sent to the LLM instead
+SUBJECT_CLASSIFIER_THRESHOLD = float(os.getenv("SUBJECT_CLASSIFIER_THRESHOLD", "0.8"))
+MODEL_VERSION = 1
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were which with
+following statements given above below correct incorrect consider select using code only both neither
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased unigrams and bigrams with stopwords removed.
+    """
+    words = [w for w in TOKEN_PATTERN.findall(text.lower()) if w not in STOPWORDS and len(w) > 1]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+def normalize_subject(subject: str) -> str:
+    # LLM replies sometimes come back quoted or with trailing punctuation
+    return subject.strip().strip("\"'.*` ").strip()
+
+# --- Dataset ---
+def record_tagged_question(text: str, subject: str, source: str, path: str = DEFAULT_DATASET_PATH) -> None:
+    """
+    Appends a tagged question ("llm" or "provided") to the training dataset.
+    """
+    subject = normalize_subject(subject)
+    if not text or not subject:
+        return
+    line = json.dumps({"text": text, "subject": subject, "source": source}, ensure_ascii=False)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+def load_dataset(path: str = DEFAULT_DATASET_PATH) -> List[Dict[str, str]]:
+    """
+    Reads the dataset, keeping the latest tag for each distinct question text.
+    """
+    rows: Dict[str, Dict[str, str]] = {}
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if row.get("text") and row.get("subject"):
+                rows[row["text"]] = row
+    return list(rows.values())
+
+# --- Model ---
+class SubjectClassifier:
+    def __init__(self, labels: List[str], idf: Dict[str, float], weights: Dict[str, List[float]], bias: List[float]):
+        self.labels = labels
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+
+    def _features(self, text: str) -> Dict[str, float]:
+        counts: Dict[str, int] = {}
+        for token in tokenize(text):
+            if token in self.idf:
+                counts[token] = counts.get(token, 0) + 1
+        # Sublinear tf * idf, L2-normalized
+        features = {token: (1 + math.log(count)) * self.idf[token] for token, count in counts.items()}
+        norm = math.sqrt(sum(v * v for v in features.values()))
+        if norm == 0:
+            return {}
+        return {token: v / norm for token, v in features.items()}
+
+    def _probabilities(self, features: Dict[str, float]) -> List[float]:
+        scores = list(self.bias)
+        for token, value in features.items():
+            token_weights = self.weights.get(token)
+            if token_weights:
+                for k, w in enumerate(token_weights):
+                    scores[k] += w * value
+        top = max(scores)
+        exps = [math.exp(s - top) for s in scores]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Returns (subject, probability). The subject is None when the text has no known vocabulary.
+        """
+        features = self._features(text)
+        if not features:
+            return None, 0.0
+        probabilities = self._probabilities(features)
+        best = max(range(len(probabilities)), key=probabilities.__getitem__)
+        return self.labels[best], probabilities[best]
+
+    @classmethod
+    def train(cls, rows: List[Dict[str, str]], epochs: int = 30, learning_rate: float = 0.5,
+              l2: float = 1e-4, min_df: int = 1, seed: int = 13) -> "SubjectClassifier":
+        labels = sorted({normalize_subject(row["subject"]) for row in rows})
+        if len(labels) < 2:
+            raise ValueError("Need questions from at least two subjects to train the classifier.")
+        label_index = {label: k for k, label in enumerate(labels)}
+
+        tokenized = [tokenize(row["text"]) for row in rows]
+        document_frequency: Dict[str, int] = {}
+        for tokens in tokenized:
+            for token in set(tokens):
+                document_frequency[token] = document_frequency.get(token, 0) + 1
+        n_docs = len(rows)
+        idf = {
+            token: math.log((1 + n_docs) / (1 + df)) + 1
+            for token, df in document_frequency.items() if df >= min_df
+        }
+
+        classifier = cls(labels, idf, {}, [0.0] * len(labels))
+        samples = [
+            (classifier._features(row["text"]), label_index[normalize_subject(row["subject"])])
+            for row in rows
+        ]
+
+        # Plain SGD on the softmax cross-entropy loss
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(samples)
+            rate = learning_rate / (1 + epoch * 0.1)
+            for features, target in samples:
+                if not features:
+                    continue
+                probabilities = classifier._probabilities(features)
+                for k, p in enumerate(probabilities):
+                    gradient = p - (1.0 if k == target else 0.0)
+                    classifier.bias[k] -= rate * gradient
+                    for token, value in features.items():
+                        token_weights = classifier.weights.setdefault(token, [0.0] * len(labels))
+                        token_weights[k] -= rate * (gradient * value + l2 * token_weights[k])
+        return classifier
+
+    def to_dict(self) -> Dict[str, Any]:
+        # Rounded and with near-zero weights dropped to keep the file compact
+        weights = {}
+        for token, token_weights in self.weights.items():
+            rounded = [round(w, 4) for w in token_weights]
+            if any(abs(w) >= 1e-3 for w in rounded):
+                weights[token] = rounded
+        return {
+            "version": MODEL_VERSION,
+            "labels": self.labels,
+            "bias": [round(b, 4) for b in self.bias],
+            "idf": {token: round(v, 4) for token, v in self.idf.items()},
+            "weights": weights,
+        }
+
+    def save(self, path: str = DEFAULT_MODEL_PATH) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"), ensure_ascii=False)
+        os.replace(tmp_path, path) # Atomic swap so running workers never read a half-written model
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_MODEL_PATH) -> "SubjectClassifier":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MODEL_VERSION:
+            raise ValueError(f"Unsupported subject model version: {data.get('version')}")
+        return cls(data["labels"], data["idf"], data["weights"], data["bias"])
+
+def load_classifier(path: str = DEFAULT_MODEL_PATH) -> Optional[SubjectClassifier]:
+    """
+    Loads the on-disk model, or returns None (LLM-only tagging) if there is no usable model.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        return SubjectClassifier.load(path)
+    except (OSError, ValueError, KeyError, json.JSONDecodeError) as e:
+        print(f"⚠️ Could not load subject classifier from {path}: {e}")
+        return None
+
+# --- Offline Report ---
+def _in_holdout(text: str, holdout_percent: int) -> bool:
+    # Stable split, so repeated reports compare like with like
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest(), 16) % 100 < holdout_percent
+
+def evaluation_report(rows: List[Dict[str, str]], threshold: float = SUBJECT_CLASSIFIER_THRESHOLD,
+                      holdout_percent: int = 20) -> Dict[str, Any]:
+    """
+    Trains on the non-holdout rows and scores the holdout LLM tags: accuracy overall and above
+    the threshold, the share of questions the fast path would handle, and per-question latency.
+    """
+    train_rows = [row for row in rows if not _in_holdout(row["text"], holdout_percent)]
+    test_rows = [row for row in rows if _in_holdout(row["text"], holdout_percent) and row.get("source") == "llm"]
+    if not test_rows:
+        raise ValueError("No LLM-tagged questions in the holdout split; collect more tagged questions first.")
+    classifier = SubjectClassifier.train(train_rows)
+
+    correct = confident = confident_correct = 0
+    latencies = []
+    for row in test_rows:
+        start = time.perf_counter()
+        subject, probability = classifier.predict(row["text"])
+        latencies.append((time.perf_counter() - start) * 1e6)
+        hit = subject == normalize_subject(row["subject"])
+        correct += hit
+        if subject is not None and probability >= threshold:
+            confident += 1
+            confident_correct += hit
+
+    latencies.sort()
+    return {
+        "train_questions": len(train_rows),
+        "holdout_llm_questions": len(test_rows),
+        "threshold": threshold,
+        "accuracy": round(correct / len(test_rows) * 100, 2),
+        "fast_path_coverage": round(confident / len(test_rows) * 100, 2),
+        "fast_path_accuracy": round(confident_correct / confident * 100, 2) if confident else None,
+        "latency_us_mean": round(sum(latencies) / len(latencies), 1),
+        "latency_us_p99": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 1),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train or evaluate the local subject classifier.")
+    parser.add_argument("command", choices=["train", "report"])
+    parser.add_argument("--dataset", default=DEFAULT_DATASET_PATH)
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--threshold", type=float, default=SUBJECT_CLASSIFIER_THRESHOLD)
+    args = parser.parse_args()
+
+    dataset = load_dataset(args.dataset)
+    print(f"--- Loaded {len(dataset)} tagged questions from {args.dataset} ---")
+    if args.command == "train":
+        trained = SubjectClassifier.train(dataset)
+        trained.save(args.model)
+        print(f"--- Saved subject classifier ({len(trained.labels)} subjects) to {args.model} ---")
+    else:
+        print(json.dumps(evaluation_report(dataset, args.threshold), indent=2))
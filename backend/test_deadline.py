@@ -0,0 +1,67 @@
+# test_deadline.py
+import os
+import tempfile
+
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("QUESTION_INDEX_DB_PATH", os.path.join(tempfile.mkdtemp(), "question_index.db"))
+
+import node
+from deadline import STAGE_COSTS, deadline_config, reserved_after
+from graph import GRAPHS, PROFILES
+
+QUESTIONS = [
+    {"id": "1", "text": "Which article of the Constitution abolishes untouchability?",
+     "options": {"A": "Article 14", "B": "Article 17", "C": "Article 21", "D": "Article 32"},
+     "correct_option": "B", "chosen_option": "B"},
+    {"id": "2", "text": "The Tropic of Cancer does not pass through which state?",
+     "options": {"A": "Rajasthan", "B": "Odisha", "C": "Tripura", "D": "Gujarat"},
+     "correct_option": "B", "chosen_option": "A"},
+    {"id": "3", "text": "Who founded the Servants of India Society?",
+     "options": {"A": "Gokhale", "B": "Tilak", "C": "Ranade", "D": "Naoroji"},
+     "correct_option": "A", "chosen_option": None},
+]
+
+class NoCallModel:
+    def invoke(self, *args, **kwargs):
+        raise AssertionError("LLM called after the deadline")
+
+    def with_structured_output(self, *args, **kwargs):
+        return self
+
+def _initial_state():
+    return {
+        "task": "Analyze UPSC Prelims performance.",
+        "all_questions": [dict(q) for q in QUESTIONS],
+        "current_question": {},
+        "evaluation_results": [],
+        "mindset_insights": [],
+        "subject_performance": {},
+        "unattempted_reasons": {},
+        "current_question_index": 0,
+        "score_summary": {},
+        "degraded_stages": [],
+        "student_history": {},
+        "final_summary_report": "",
+    }
+
+@pytest.mark.parametrize("profile", PROFILES)
+def test_expired_deadline_makes_no_llm_calls(profile, monkeypatch):
+    monkeypatch.setattr(node, "model", NoCallModel())
+    final_state = GRAPHS[profile].invoke(_initial_state(), deadline_config("1", 0, PROFILES[profile]))
+
+    statuses = [r["status"] for r in final_state["evaluation_results"]]
+    assert statuses == ["Correct", "Wrong", "Unattempted"]
+    assert all(q["subject"] for q in final_state["all_questions"])
+    degraded = {d["stage"]: d["action"] for d in final_state["degraded_stages"]}
+    # One entry per stage, however many questions degraded
+    assert len(degraded) == len(final_state["degraded_stages"])
+    assert degraded["evaluate_question"] == "decided 3 question(s) from the answer key"
+    assert "summary_report" in degraded
+    assert "because the analysis deadline was reached" in final_state["final_summary_report"]
+
+def test_tagging_reserves_evaluation_of_every_question():
+    config = deadline_config("1", 60, PROFILES["fast"])
+    reserved = reserved_after(config, "llm_subject_tagging", {"evaluate_question": 10})
+    assert reserved == STAGE_COSTS["evaluate_question"] * 10 + STAGE_COSTS["summary_report"]
@@ -0,0 +1,30 @@
+# test_graph.py
+import os
+import tempfile
+
+import pytest
+
+# node.py builds the OpenAI client and opens the question index at import time
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("QUESTION_INDEX_DB_PATH", os.path.join(tempfile.mkdtemp(), "question_index.db"))
+
+from graph import GRAPHS, NODES, PROFILES, unread_outputs
+
+@pytest.mark.parametrize("profile", PROFILES)
+def test_profile_has_no_unread_outputs(profile):
+    assert unread_outputs(profile) == {}
+
+@pytest.mark.parametrize("profile", PROFILES)
+def test_profile_excludes_planner(profile):
+    assert "planner" not in PROFILES[profile]
+
+@pytest.mark.parametrize("profile", PROFILES)
+def test_compiled_graph_runs_only_profile_nodes(profile):
+    compiled_nodes = set(GRAPHS[profile].get_graph().nodes) - {"__start__", "__end__"}
+    assert compiled_nodes == set(PROFILES[profile])
+
+def test_own_reads_do_not_count_as_consumed(monkeypatch):
+    # A node that only reads back its own output is still flagged
+    monkeypatch.setitem(NODES, "loopback", {"fn": None, "reads": ["scratch"], "writes": ["scratch"], "llm_calls": "none"})
+    monkeypatch.setitem(PROFILES, "loopback", ["loopback"])
+    assert unread_outputs("loopback") == {"loopback": ["scratch"]}
@@ -0,0 +1,68 @@
+# test_performance_store.py
+import os
+import random
+import tempfile
+
+import pytest
+
+os.environ.setdefault("PERFORMANCE_DB_PATH", os.path.join(tempfile.mkdtemp(), "performance.db"))
+
+from performance_store import EWMA_ALPHA, PerformanceStore
+
+def _results(subject, correct, wrong, unattempted, unknown=0):
+    statuses = ["Correct"] * correct + ["Wrong"] * wrong + ["Unattempted"] * unattempted + ["Unknown"] * unknown
+    return [{"qid": f"{subject}-{i}", "status": status, "subject": subject} for i, status in enumerate(statuses)]
+
+def _recomputed(history):
+    # Full recompute over the stored per-test accuracies, for comparison with the running sums
+    points = [(entry["sequence"], entry["accuracy"]) for entry in history if entry["accuracy"] is not None]
+    ewma = None
+    for _, accuracy in points:
+        ewma = accuracy if ewma is None else EWMA_ALPHA * accuracy + (1 - EWMA_ALPHA) * ewma
+    if len(points) < 2:
+        return ewma, None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / sum((x - mean_x) ** 2 for x, _ in points)
+    return ewma, slope
+
+@pytest.fixture
+def store(tmp_path):
+    return PerformanceStore(str(tmp_path / "performance.db"))
+
+def test_running_aggregates_match_full_recompute(store):
+    rng = random.Random(7)
+    for _ in range(12):
+        results = []
+        for subject in ("History", "Polity", "Geography"):
+            # Some tests leave a subject unattempted, which must not move its trend
+            attempted = rng.randint(0, 6)
+            correct = rng.randint(0, attempted)
+            results += _results(subject, correct, attempted - correct, rng.randint(0, 3))
+        store.record_submission("s1", results, len(results))
+
+    trends = store.get_trends("s1", include_history=True)
+    assert trends["submissions"] == 12
+    for subject, data in trends["subjects"].items():
+        ewma, slope = _recomputed(data["history"])
+        assert data["ewma_accuracy"] == pytest.approx(round(ewma, 2) if ewma is not None else None)
+        assert data["trend_slope"] == pytest.approx(round(slope, 2) if slope is not None else None)
+        assert data["total_questions"] == sum(entry["total_questions"] for entry in data["history"])
+
+def test_trend_follows_accuracy(store):
+    for correct in (1, 2, 3, 4):
+        store.record_submission("s1", _results("History", correct, 4 - correct, 0), 4)
+    history = store.get_trends("s1")["subjects"]["History"]
+    assert history["trend_slope"] == pytest.approx(25.0)
+    assert history["trend"] == "Improving"
+
+def test_unknown_results_are_not_recorded(store):
+    store.record_submission("s1", _results("History", 2, 1, 1, unknown=4), 8)
+    overall = store.get_trends("s1")["overall"]
+    assert overall["total_questions"] == 4
+    assert overall["attempt_rate"] == 75.0
+    assert store.get_trends("s1", include_history=True)["subjects"]["History"]["history"][0]["total_questions"] == 4
+
+def test_submission_without_evaluations_is_skipped(store):
+    assert store.record_submission("s1", _results("History", 0, 0, 0, unknown=3), 3) is None
+    assert store.get_trends("s1")["submissions"] == 0
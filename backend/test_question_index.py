@@ -0,0 +1,55 @@
+# test_question_index.py
+import os
+import tempfile
+
+import pytest
+
+os.environ.setdefault("QUESTION_INDEX_DB_PATH", os.path.join(tempfile.mkdtemp(), "question_index.db"))
+
+from question_index import QuestionIndex
+
+QUESTION = {
+    "id": "1",
+    "text": "Which river is known as the Ganga of the South in peninsular India?",
+    "options": {"A": "Godavari", "B": "Krishna", "C": "Cauvery", "D": "Narmada"},
+    "correct_option": "A",
+    "chosen_option": "B",
+}
+INSIGHT = {
+    "question_id": "1",
+    "chosen_option_analysis": "The student picked option B, confusing the Krishna with the Godavari.",
+    "depth_of_knowledge_assessment": "Superficial.",
+    "distractor_analysis": {"C": "Cauvery is in the south but smaller.", "D": "Narmada flows west."},
+    "improvement_suggestion": "Compare option A and option B by basin size.",
+}
+
+@pytest.fixture
+def index(tmp_path):
+    index = QuestionIndex(str(tmp_path / "question_index.db"))
+    index.add_insight(QUESTION, INSIGHT)
+    return index
+
+def _paraphrase(options, correct_option, chosen_option):
+    return {
+        "id": "2",
+        "text": "Which river is known as the Ganga of the South in India?",
+        "options": options,
+        "correct_option": correct_option,
+        "chosen_option": chosen_option,
+    }
+
+def test_paraphrase_with_same_options_reuses_insight(index):
+    question = _paraphrase(dict(QUESTION["options"]), "A", "B")
+    insight = index.lookup_insight(question)
+    assert insight == {**INSIGHT, "question_id": "2"}
+
+def test_paraphrase_with_reordered_options_is_a_miss(index):
+    # Same correct and chosen answers, but the labels in the stored free text would point at the wrong options
+    question = _paraphrase({"A": "Krishna", "B": "Godavari", "C": "Cauvery", "D": "Narmada"}, "B", "A")
+    assert index.lookup_insight(question) is None
+    stats = index.stats()["mindset"]
+    assert (stats["lookups"], stats["hits"]) == (1, 0)
+
+def test_different_chosen_option_is_a_miss(index):
+    question = _paraphrase(dict(QUESTION["options"]), "A", "C")
+    assert index.lookup_insight(question) is None